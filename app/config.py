@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = True
+    APP_ROLE: str = "all"  # api-light (auth + history) | rag | all – routers mounted by app.main
     
     # Database Settings
     DB_HOST: str = "localhost"
@@ -22,9 +23,43 @@ class Settings(BaseSettings):
     DB_USER: str = "postgres"
     DB_PASSWORD: str = "password"
     
+    # Connection Pool Settings (per process – total = workers × (size + overflow))
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_USE_NULLPOOL: bool = False  # set when an external pooler (PgBouncer) is in front
+    DB_ECHO: bool = False  # log every SQL statement (independent of DEBUG)
+    
+    # Read Replica Settings – "host" or "host:port" entries (same DB name/credentials)
+    DB_REPLICA_HOSTS: list = []
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0  # replicas lagging more than this are skipped
+    DB_REPLICA_CHECK_INTERVAL: float = 10.0  # seconds between lag probes per replica
+    DB_REPLICA_PROBE_TIMEOUT_SECONDS: float = 2.0  # connect + lag query limit; slower replicas count as unavailable
+    
     # Vector Database Settings
     VECTOR_DIMENSION: int = 1024
     
+    # RAG Settings
+    RAG_BATCH_MAX_QUERIES: int = 16  # upper bound for /rag/retrieve/batch
+    VECTOR_SEARCH_FAST_PATH: bool = False  # raw asyncpg + binary pgvector codec for the ANN query
+    FAST_SEARCH_POOL_SIZE: int = 10
+    FAST_SEARCH_STATEMENT_CACHE_SIZE: int = 100
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 2048
+    RETRIEVAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    CORPUS_VERSION_TTL_SECONDS: float = 5.0  # how long the corpus version is trusted before re-reading
+    ACCESS_POLICY_FROM_DB: bool = False  # load the matrix from the access_level_matrix view at startup
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # cosine threshold for reusing a cached answer
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    # Best-chunk L2 distance above which /rag/answer replies "no information" without the LLM.
+    # {"<embedding model>": {"<chunk language>": max_distance, "default": max_distance}}; {} = off.
+    # Calibrate with scripts/calibrate_relevance.py.
+    RELEVANCE_MAX_DISTANCE: dict = {}
+    
     # Security Settings
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
@@ -41,11 +76,65 @@ class Settings(BaseSettings):
     YI_MODEL_PATH: Optional[str] = None
     MISTRAL_MODEL_PATH: Optional[str] = None
     
+    # Query History Writes
+    HISTORY_DURABILITY: str = "async"  # async (write-behind) | ack (wait for the batch commit) | sync (inline, per request)
+    HISTORY_BATCH_SIZE: int = 200  # rows per multi-row INSERT
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 0.5  # max time an entry waits in the queue
+    HISTORY_QUEUE_MAX: int = 10000  # pending entries before producers wait
+    HISTORY_WRITE_RETRIES: int = 1  # extra attempts for a failed batch before its rows are dropped
+    HISTORY_RETRY_DELAY_SECONDS: float = 0.5  # wait before a retry (grows with each attempt)
+    HISTORY_PARTITION_MONTHS_AHEAD: int = 3  # monthly query_history partitions created in advance
+    HISTORY_RETENTION_MONTHS: int = 24  # scripts/history_retention.py detaches/drops older partitions
+    HISTORY_EXPORT_FETCH_SIZE: int = 500  # rows per server-side cursor fetch in GET /history/export
+    
+    # Answer Jobs (POST /rag/answer/jobs)
+    ANSWER_JOB_TTL_SECONDS: float = 900.0  # how long finished results can be polled
+    ANSWER_JOB_MAX_JOBS: int = 1000  # stored jobs per process (queued + finished)
+    ANSWER_JOB_QUEUE_TIMEOUT_SECONDS: float = 600.0  # jobs may wait longer for the LLM than requests
+    
+    # LLM Backend
+    LLM_BACKEND: str = "local"  # local (in-process / replica pool) | http (shared completion server)
+    LLM_HTTP_URL: str = "http://127.0.0.1:8080/v1"  # OpenAI-compatible base URL (llama-server, vLLM, …)
+    LLM_HTTP_MODEL: str = "yi-1.5-9b-chat"
+    LLM_HTTP_API_KEY: Optional[str] = None
+    LLM_HTTP_TIMEOUT_SECONDS: float = 120.0
+    LLM_HTTP_MAX_CONNECTIONS: int = 16  # keep-alive pool shared by all generation threads
+    
+    # LLM Runtime (LLM_BACKEND=local)
+    LLM_RUNTIME: str = "ctransformers"  # ctransformers | llama_cpp
+    LLM_PREFIX_CACHE: bool = True  # reuse KV state of the static instruction block (llama_cpp / http cache_prompt)
+    
+    # Prompt budget
+    LLM_TOKENIZER: str = ""  # local tokenizer dir or HF name; "" = the model's own (GGUF vocab / in-process model), else length estimate
+    LLM_CONTEXT_TOKEN_BUDGET: int = 3000  # context tokens; 4096 window - instructions - question - answer
+    
+    # Answer length caps (max new tokens) by question type; also limited by context size
+    LLM_ANSWER_TOKENS_SHORT: int = 96  # "what is / how much / nedir / ne kadar"
+    LLM_ANSWER_TOKENS_DEFAULT: int = 160
+    LLM_ANSWER_TOKENS_LONG: int = 320  # "explain / compare / list / açıkla / nasıl"
+    
+    # LLM Replicas
+    LLM_REPLICAS: int = 0  # 0 = model in the API process; N = N worker processes
+    LLM_THREADS: int = 8  # CPU threads per model instance
+    LLM_REPLICA_MAX_RESTARTS: int = 5  # consecutive crashes before a replica is given up
+    LLM_REPLICA_RESTART_BACKOFF_SECONDS: float = 1.0  # first restart delay, doubled per crash (max 60 s)
+    
+    # LLM Scheduling (per process)
+    LLM_MAX_CONCURRENCY: int = 1  # concurrent generations per model instance
+    LLM_MAX_QUEUE: int = 8  # requests allowed to wait for a slot before 503s
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 60.0  # max wait for a slot before 503
+    LLM_REQUEST_DEADLINE_SECONDS: float = 120.0  # /rag/answer(+stream) generation is cancelled after this (from slot acquisition); 0 = none
+    
     @property
     def database_url(self) -> str:
         """Construct database URL for asyncpg"""
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    def replica_database_url(self, replica: str) -> str:
+        """Construct asyncpg URL for a read replica given as host or host:port"""
+        host, _, port = replica.partition(":")
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{host}:{port or self.DB_PORT}/{self.DB_NAME}"
+    
     @property
     def sync_database_url(self) -> str:
         """Construct database URL for psycopg2 (sync operations)"""
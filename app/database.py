@@ -3,18 +3,41 @@ Database Configuration
 SQLAlchemy async engine and database session management.
 """
 
+import asyncio
+import time
+
+from fastapi import Depends
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.pool import NullPool
 from .config import settings
+from .services.metrics import metrics
+
+def engine_options() -> dict:
+    """Engine keyword arguments built from the DB_* pool settings.
+
+    A QueuePool keeps connections open across requests (pre-pinged and
+    recycled); DB_USE_NULLPOOL restores connect-per-checkout for deployments
+    behind an external pooler such as PgBouncer. SQL echo is controlled by
+    DB_ECHO independently of DEBUG.
+    """
+    options = {"echo": settings.DB_ECHO, "future": True}
+    if settings.DB_USE_NULLPOOL:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    return options
+
 
 # Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.DEBUG,
-    poolclass=NullPool,
-    future=True
-)
+engine = create_async_engine(settings.database_url, **engine_options())
 
 # Create async session factory
 async_session_factory = async_sessionmaker(
@@ -23,6 +46,115 @@ async_session_factory = async_sessionmaker(
     expire_on_commit=False
 )
 
+# ---------------------------------------------------------------------------
+# Read replicas
+# ---------------------------------------------------------------------------
+
+# Seconds the replica is behind the primary. 0 only when it has replayed everything
+# it received *and* its WAL receiver is streaming (an idle primary would otherwise
+# look like growing lag). A disconnected standby also has receive = replay LSN, so
+# it is judged by the age of its last replayed transaction (infinite if none).
+# The receiver status needs pg_read_all_stats; without it the age is used.
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+             AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity'::float8)
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    """Routes read-only sessions to healthy replicas, falling back to the primary.
+
+    Replicas are used round-robin. Each one is probed for replication lag at
+    most every DB_REPLICA_CHECK_INTERVAL seconds; a replica that is
+    unreachable or lags more than DB_REPLICA_MAX_LAG_SECONDS is skipped until
+    its next probe. With no usable replica the primary serves the read.
+
+    One request probes a replica at a time (per-replica lock); concurrent
+    requests keep using the last result meanwhile. A probe, including the
+    connect, is abandoned after DB_REPLICA_PROBE_TIMEOUT_SECONDS, so an
+    unreachable replica costs reads at most that long once per interval.
+    Failures are counted as ``db.replica_unavailable`` and the last error is
+    shown under ``db_replicas`` in ``GET /metrics``.
+    """
+
+    def __init__(self, replicas: list, primary_factory: async_sessionmaker) -> None:
+        self.primary_factory = primary_factory
+        self.engines = [
+            create_async_engine(
+                settings.replica_database_url(r),
+                connect_args={"timeout": settings.DB_REPLICA_PROBE_TIMEOUT_SECONDS},
+                **engine_options(),
+            )
+            for r in replicas
+        ]
+        self.factories = [async_sessionmaker(e, class_=AsyncSession, expire_on_commit=False) for e in self.engines]
+        self.names = list(replicas)
+        self._lag = [None] * len(self.engines)  # last measured lag (inf = unreachable)
+        self._checked_at = [0.0] * len(self.engines)
+        self._errors = [None] * len(self.engines)
+        self._locks = [asyncio.Lock() for _ in self.engines]
+        self._next = 0
+        self.primary_fallbacks = 0
+
+    def _fresh(self, idx: int) -> bool:
+        return self._lag[idx] is not None and time.monotonic() - self._checked_at[idx] < settings.DB_REPLICA_CHECK_INTERVAL
+
+    async def _measure(self, idx: int) -> float:
+        async with self.engines[idx].connect() as conn:
+            return float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0.0)
+
+    async def _probe(self, idx: int) -> float:
+        if self._fresh(idx):
+            return self._lag[idx]
+        lock = self._locks[idx]
+        if lock.locked() and self._lag[idx] is not None:
+            return self._lag[idx]  # another request is probing; use the last result
+        async with lock:
+            if self._fresh(idx):
+                return self._lag[idx]
+            try:
+                lag = await asyncio.wait_for(self._measure(idx), timeout=settings.DB_REPLICA_PROBE_TIMEOUT_SECONDS)
+                self._errors[idx] = None
+            except Exception as exc:
+                metrics.inc("db.replica_unavailable")
+                self._errors[idx] = f"{type(exc).__name__}: {exc}"
+                lag = float("inf")
+            self._lag[idx], self._checked_at[idx] = lag, time.monotonic()
+            return lag
+
+    async def read_factory(self) -> async_sessionmaker:
+        """Session factory for the next healthy replica (or the primary)."""
+        for _ in range(len(self.factories)):
+            idx = self._next % len(self.factories)
+            self._next += 1
+            if await self._probe(idx) <= settings.DB_REPLICA_MAX_LAG_SECONDS:
+                return self.factories[idx]
+        if self.factories:
+            self.primary_fallbacks += 1
+        return self.primary_factory
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                {"replica": name, "lag_seconds": lag, "last_error": error, **pool_stats(eng)}
+                for name, lag, error, eng in zip(self.names, self._lag, self._errors, self.engines)
+            ],
+            "primary_fallbacks": self.primary_fallbacks,
+        }
+
+    async def dispose(self) -> None:
+        for eng in self.engines:
+            await eng.dispose()
+
+
+replica_router = ReplicaRouter(settings.DB_REPLICA_HOSTS, async_session_factory)
+
 # Create declarative base
 Base = declarative_base()
 
@@ -33,4 +165,38 @@ async def get_db() -> AsyncSession:
         try:
             yield session
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
+
+
+# Dependency to get a read-only database session (replica when available)
+async def get_read_db(primary: AsyncSession = Depends(get_db)) -> AsyncSession:
+    """Dependency for read-only work: a replica session, or the primary as fallback.
+
+    When the primary serves the read, the request's :func:`get_db` session is
+    reused, so a route depending on both checks out one primary connection.
+    Never write through this session – writes must use :func:`get_db`.
+    """
+    factory = await replica_router.read_factory()
+    if factory is replica_router.primary_factory:
+        yield primary
+        return
+    async with factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def pool_stats(db_engine=engine) -> dict:
+    """Connection pool statistics for monitoring (see GET /metrics)."""
+    pool = db_engine.pool
+    if isinstance(pool, NullPool):
+        return {"pool": "NullPool"}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
@@ -1,68 +1,145 @@
 """
 BankBot FastAPI Application
 Main application entry point with health check endpoint.
+
+``create_app(role)`` only mounts the routers a process needs:
+
+* ``api-light`` – /auth and /history; never imports the RAG / LLM stack
+* ``rag``       – /rag (embedding model, vector search, LLM)
+* ``all``       – everything (default, ``APP_ROLE``)
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
-from .database import engine, Base
+from .database import engine, Base, async_session_factory, pool_stats, replica_router
 from .config import settings
-from .routers import auth as auth_router
-from .routers import rag as rag_router
-from .routers import history as history_router
-
-# Create FastAPI app instance
-app = FastAPI(
-    title="BankBot API",
-    description="Intelligent Banking Assistant with Document Processing",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "ok"}
-
-# Startup event
-@app.on_event("startup")
-async def startup():
-    """Initialize database tables on startup"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-# Shutdown event
-@app.on_event("shutdown")
-async def shutdown():
-    """Clean up resources on shutdown"""
-    await engine.dispose()
-
-# Root endpoint
-@app.get("/")
-async def root():
-    """Root endpoint"""
-    return {
-        "message": "Welcome to BankBot API",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
-
-# Include routers
-app.include_router(auth_router.router)
-app.include_router(rag_router.router)
-app.include_router(history_router.router)
+from .services.access_policy import load_policy_from_db
+from .services.history_partitions import ensure_partitions as ensure_history_partitions
+from .services.metrics import metrics
+
+ROLES = ("api-light", "rag", "all")
+
+
+def create_app(role: str = settings.APP_ROLE) -> FastAPI:
+    """Build the FastAPI app for *role* (see module docstring)."""
+    if role not in ROLES:
+        raise ValueError(f"Unknown app role '{role}', expected one of {', '.join(ROLES)}")
+    serve_light = role in ("api-light", "all")
+    serve_rag = role in ("rag", "all")
+
+    # Create FastAPI app instance
+    app = FastAPI(
+        title="BankBot API",
+        description="Intelligent Banking Assistant with Document Processing",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc"
+    )
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Configure appropriately for production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],  # history pagination
+    )
+
+    # Health check endpoint
+    @app.get("/health")
+    async def health_check():
+        """Health check endpoint"""
+        return {"status": "ok", "role": role}
+
+    # Connection pool statistics reported by /metrics
+    metrics.register("db_pool", pool_stats)
+    metrics.register("db_replicas", replica_router.stats)
+
+    # Metrics endpoint
+    @app.get("/metrics")
+    async def metrics_snapshot():
+        """In-process counters and cache statistics (JSON)"""
+        return metrics.snapshot()
+
+    shutdown_hooks = []
+
+    if serve_light:
+        from .routers import auth as auth_router
+        from .routers import history as history_router
+
+        app.include_router(auth_router.router)
+        app.include_router(history_router.router)
+
+    if serve_rag:
+        from .routers import rag as rag_router
+        from .services.answer_jobs import job_store
+        from .services.fast_search import close_pool as close_fast_search_pool
+        from .services.fast_search import pool_stats as fast_search_pool_stats
+        from .services.history_writer import history_writer
+        from .services.llm_scheduler import SchedulerOverloaded
+        from .services.llm_service import close_llm
+
+        metrics.register("fast_search_pool", fast_search_pool_stats)
+
+        # LLM overload -> fast 503 with Retry-After instead of an ever-growing queue
+        @app.exception_handler(SchedulerOverloaded)
+        async def llm_overloaded_handler(request: Request, exc: SchedulerOverloaded):
+            return JSONResponse(
+                status_code=exc.status_code,
+                content={"detail": f"{exc.reason}, please retry later."},
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+
+        async def close_rag() -> None:
+            await job_store.shutdown()
+            await history_writer.close()  # after the jobs, which may still log history
+            await close_fast_search_pool()
+            close_llm()
+
+        shutdown_hooks.append(close_rag)
+        app.include_router(rag_router.router)
+
+    # Startup event
+    @app.on_event("startup")
+    async def startup():
+        """Initialize database tables on startup"""
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await ensure_history_partitions(conn, settings.HISTORY_PARTITION_MONTHS_AHEAD)
+        if serve_rag:
+            from .services.token_counter import warm_tokenizer
+
+            await warm_tokenizer()
+        if serve_rag and settings.ACCESS_POLICY_FROM_DB:
+            async with async_session_factory() as session:
+                await load_policy_from_db(session)
+
+    # Shutdown event
+    @app.on_event("shutdown")
+    async def shutdown():
+        """Clean up resources on shutdown"""
+        for hook in shutdown_hooks:
+            await hook()
+        await replica_router.dispose()
+        await engine.dispose()
+
+    # Root endpoint
+    @app.get("/")
+    async def root():
+        """Root endpoint"""
+        return {
+            "message": "Welcome to BankBot API",
+            "version": "1.0.0",
+            "docs": "/docs"
+        }
+
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -70,4 +147,4 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=True
-    ) 
\ No newline at end of file
+    )
@@ -3,15 +3,15 @@ Database Models
 SQLAlchemy models for BankBot application.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, func, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Index, func, Float, JSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from .database import Base
 from .config import settings
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 from pydantic import BaseModel
 
@@ -278,15 +278,20 @@ class TokenData(BaseModel):
 # ---------------------------------------
 
 class QueryHistory(Base):
-    """Stores each user query and corresponding response for session history."""
+    """Stores each user query and corresponding response for session history.
+
+    Range-partitioned by month on ``created_at`` (sql/005_query_history_partitioning.sql),
+    hence the composite primary key.
+    """
     __tablename__ = "query_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     # Relationship to user that issued the query
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     # Logical conversation/session identifier – can group many QueryHistory rows
-    session_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    session_id = Column(UUID(as_uuid=True), nullable=False)
 
     # Route that produced this entry -> retrieve | answer
     route = Column(String(20), nullable=False)
@@ -294,18 +299,33 @@ class QueryHistory(Base):
     # Original user query text
     query_text = Column(Text, nullable=False)
 
-    # Raw text returned to the user (chunks JSON or answer text)
+    # Raw text returned to the user (chunks JSON or answer text) – legacy rows only
     response_text = Column(Text, nullable=True)
 
+    # Compact response: chunk references (id, access type, content hash) or the answer text;
+    # the full response is rebuilt on read (history_service.expand_responses)
+    response_payload = Column(JSONB, nullable=True)
+
     # Request metadata
     ip_address = Column(String(45), nullable=True)
 
-    # Timestamp
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Timestamp (partition key, part of the primary key)
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
     # Relationships
     user = relationship("User")
 
+
+# Session list / session messages: WHERE user_id [AND session_id] ORDER BY created_at DESC, id DESC
+Index(
+    "ix_query_history_user_session_created",
+    QueryHistory.user_id,
+    QueryHistory.session_id,
+    QueryHistory.created_at.desc(),
+    QueryHistory.id.desc(),
+)
+Index("ix_query_history_user_created", QueryHistory.user_id, QueryHistory.created_at.desc(), QueryHistory.id.desc())
+
 class DocumentChunk(Base):
     """Vector store chunk model (PGVector)."""
     __tablename__ = "document_chunks"
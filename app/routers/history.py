@@ -1,14 +1,20 @@
-from typing import List, Optional
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Optional
 from uuid import UUID
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, get_read_db, replica_router
 from ..dependencies import get_current_token_payload
 from ..services import history_service as history_srv
+from ..services.metrics import metrics
 
 router = APIRouter(prefix="/history", tags=["history"])
 
@@ -34,41 +40,143 @@ class HistoryEntrySchema(BaseModel):
 
 @router.get("/sessions", response_model=List[SessionSummary])
 async def list_user_sessions(
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    db: AsyncSession = Depends(get_read_db),
     payload: dict = Depends(get_current_token_payload),
 ):
-    """Return list of session ids for the current user with last query snippet."""
+    """Return the current user's sessions (newest first) with last query snippet.
+
+    Paged by keyset: when more sessions exist, the ``X-Next-Cursor`` response
+    header holds the cursor for the next page.
+    """
     user_id = payload.get("sub")
-    session_ids = await history_srv.list_sessions(db, user_id=UUID(user_id))
-    summaries: List[SessionSummary] = []
-    for sid in session_ids:
-        messages = await history_srv.session_messages(db, user_id=UUID(user_id), session_id=sid)
-        if not messages:
-            continue
-        last_msg = messages[0]  # newest first due to ordering
-        summaries.append(
-            SessionSummary(
-                session_id=sid,
-                last_query=last_msg.query_text[:120],
-                last_created_at=last_msg.created_at.isoformat(),
-            )
+    try:
+        rows, next_cursor = await history_srv.list_session_summaries(
+            db, user_id=UUID(user_id), limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        SessionSummary(
+            session_id=row["session_id"],
+            last_query=row["last_query"],
+            last_created_at=row["created_at"].isoformat(),
         )
-    return summaries
+        for row in rows
+    ]
 
 
 @router.get("/sessions/{session_id}", response_model=List[HistoryEntrySchema])
 async def get_session_messages(
     session_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    response_mode: str = Query("full", pattern="^(full|truncated|none)$"),
+    db: AsyncSession = Depends(get_read_db),
     payload: dict = Depends(get_current_token_payload),
 ):
+    """Entries of a session, newest first, one page at a time.
+
+    ``response_mode``: ``full`` (default), ``truncated`` (first 200 chars) or
+    ``none`` (null) – fetch a full payload later via ``/history/entries/{id}``.
+    """
     user_id = UUID(payload.get("sub"))
-    messages = await history_srv.session_messages(db, user_id=user_id, session_id=session_id)
-    if not messages:
+    try:
+        messages, next_cursor = await history_srv.session_messages(
+            db,
+            user_id=user_id,
+            session_id=session_id,
+            limit=limit,
+            cursor=cursor,
+            response_mode=response_mode,
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not messages and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found or empty")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return messages
 
 
+@router.get("/entries/{entry_id}", response_model=HistoryEntrySchema)
+async def get_history_entry(
+    entry_id: UUID,
+    db: AsyncSession = Depends(get_read_db),
+    payload: dict = Depends(get_current_token_payload),
+):
+    """A single history entry with its full ``response_text``."""
+    entry = await history_srv.get_entry(db, user_id=UUID(payload.get("sub")), entry_id=entry_id)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Entry not found")
+    return entry
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+async def _ndjson_lines(batches) -> AsyncIterator[str]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps({col: _export_value(row[col]) for col in history_srv.EXPORT_COLUMNS}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+async def _csv_lines(batches) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(history_srv.EXPORT_COLUMNS)
+    async for rows in batches:
+        for row in rows:
+            writer.writerow([_export_value(row[col]) for col in history_srv.EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only: no entries
+        yield buffer.getvalue()
+
+
+@router.get("/export")
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[UUID] = Query(None, description="Admins only: export this user's history instead of your own"),
+    db: AsyncSession = Depends(get_read_db),
+    payload: dict = Depends(get_current_token_payload),
+):
+    """Stream the full query history of the caller (or, for admins, of *user_id*).
+
+    Rows are read through a server-side cursor and written as they arrive,
+    so exports of any size use constant memory.
+    """
+    caller_id = UUID(payload.get("sub"))
+    target_id = user_id or caller_id
+    if target_id != caller_id and not await history_srv.is_admin(db, caller_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can export other users' history")
+    metrics.inc(f"history.exports.{format}")
+
+    # The request-scoped session is closed while the body streams; the export opens its own
+    factory = await replica_router.read_factory()
+    batches = history_srv.stream_history(factory, user_id=target_id, fetch_size=settings.HISTORY_EXPORT_FETCH_SIZE)
+    lines = _csv_lines(batches) if format == "csv" else _ndjson_lines(batches)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        lines,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="history-{target_id}.{format}"'},
+    )
+
+
 @router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_session(
     session_id: UUID,
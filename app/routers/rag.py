@@ -1,18 +1,33 @@
+import asyncio
+from contextlib import aclosing
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from uuid import uuid4, UUID
 import json
+import time
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, get_read_db, async_session_factory
 from ..dependencies import get_current_token_payload
+from ..services import answer_jobs as jobs_srv
+from ..services import answer_service as answer_srv
+from ..services import history_service as history_srv
 from ..services import rag_service as rag
-from ..services.llm_service import load_llm, generate_answer, generate_answer_async
+from ..services.history_writer import record_history
+from ..services.llm_scheduler import llm_scheduler
+from ..services.llm_service import Cancellation, load_llm, generate_answer_async, astream_answer
+from ..services.metrics import metrics
 
 router = APIRouter(prefix="/rag", tags=["rag"])
 
+DISCONNECT_POLL_SECONDS = 0.5
+
 
 class QueryRequest(BaseModel):
     query: str
@@ -32,27 +47,19 @@ class RetrieveResponse(BaseModel):
     chunks: List[ChunkResponse]
 
 
-@router.post("/retrieve", response_model=RetrieveResponse)
-async def retrieve_top_chunks(req: QueryRequest, request: Request, db: AsyncSession = Depends(get_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
-    """Return top 3 chunks for query based on user's access level."""
-    print("[DEBUG] /rag/retrieve called by", payload.get("username"))
-    print("[DEBUG] Query:", req.query)
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    session_id: Optional[UUID] = None
 
-    access_level: int = int(payload.get("access_level", 1))
-    embed = await rag.embed_text_async(req.query)
-    allowed_types = rag.allowed_doc_types(access_level)
-    print("[DEBUG] Allowed doc types:", allowed_types)
-    if not allowed_types:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to access the relevant information.")
 
-    chunks = await rag.vector_search(db, embed, allowed_types, top_k=3)
-    print(f"[DEBUG] Retrieved {len(chunks)} raw chunks")
+class BatchRetrieveResponse(BaseModel):
+    results: List[RetrieveResponse]
+
 
+def _chunk_responses(chunks: List[Dict[str, Any]], access_level: int) -> List[ChunkResponse]:
     resp_chunks: List[ChunkResponse] = []
-    for idx, ch in enumerate(chunks, 1):
-        citation = f"{ch['entity']} – {ch['main_section_title']}"
-        if ch.get("sub_section_title"):
-            citation += f", {ch['sub_section_title']}"
+    for ch in chunks:
+        citation = rag.chunk_citation(ch)
         content = rag.choose_content(ch, access_level)
         # Skip chunks that are not visible per access matrix or have no resolvable content
         if content is None:
@@ -67,6 +74,25 @@ async def retrieve_top_chunks(req: QueryRequest, request: Request, db: AsyncSess
                 distance=float(ch["distance"]),
             )
         )
+    return resp_chunks
+
+
+@router.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve_top_chunks(req: QueryRequest, request: Request, db: AsyncSession = Depends(get_db), read_db: AsyncSession = Depends(get_read_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Return top 3 chunks for query based on user's access level."""
+    print("[DEBUG] /rag/retrieve called by", payload.get("username"))
+    print("[DEBUG] Query:", req.query)
+
+    access_level: int = int(payload.get("access_level", 1))
+    allowed_types = rag.allowed_doc_types(access_level)
+    print("[DEBUG] Allowed doc types:", allowed_types)
+    if not allowed_types:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to access the relevant information.")
+
+    _, chunks = await rag.retrieve_chunks(read_db, req.query, access_level, top_k=3)
+    print(f"[DEBUG] Retrieved {len(chunks)} raw chunks")
+
+    resp_chunks = _chunk_responses(chunks, access_level)
 
     if not resp_chunks:
         # There were chunks but none accessible due to finer-grained restrictions
@@ -80,105 +106,278 @@ async def retrieve_top_chunks(req: QueryRequest, request: Request, db: AsyncSess
     # -------------------------------------------------------------
     # Persist history
     # -------------------------------------------------------------
-    from ..services import history_service as history_srv
-
     session_id = req.session_id or uuid4()
     ip_addr = request.client.host if request.client else None
-    await history_srv.log_history(
+    await record_history(
         db,
-        user_id=UUID(payload.get("sub")),
-        session_id=session_id,
-        route="retrieve",
-        query_text=req.query,
-        response_text=json.dumps([c.dict() for c in resp_chunks], ensure_ascii=False),
-        ip_address=ip_addr,
+        [
+            dict(
+                user_id=UUID(payload.get("sub")),
+                session_id=session_id,
+                route="retrieve",
+                query_text=req.query,
+                response_payload=history_srv.retrieve_payload([c.dict() for c in resp_chunks], access_level),
+                ip_address=ip_addr,
+            )
+        ],
     )
 
     return resp
 
 
-class AnswerResponse(BaseModel):
-    query: str
-    answer: str
+@router.post("/retrieve/batch", response_model=BatchRetrieveResponse)
+async def retrieve_top_chunks_batch(req: BatchQueryRequest, request: Request, db: AsyncSession = Depends(get_db), read_db: AsyncSession = Depends(get_read_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Return top 3 chunks for each query in one call (single embed batch, single SQL statement).
 
+    Results come back in input order. Unlike /rag/retrieve, a query with no
+    accessible chunks yields an empty list instead of failing the whole batch.
+    """
+    print("[DEBUG] /rag/retrieve/batch called by", payload.get("username"), "queries:", len(req.queries))
 
-@router.post("/answer", response_model=AnswerResponse)
-async def answer_query(req: QueryRequest, request: Request, db: AsyncSession = Depends(get_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
-    """Generate LLM answer using RAG context respecting access level."""
-    print("[DEBUG] /rag/answer called by", payload.get("username"))
-    print("[DEBUG] Query:", req.query)
+    if not req.queries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one query is required.")
+    if len(req.queries) > settings.RAG_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.RAG_BATCH_MAX_QUERIES} queries per batch.")
 
     access_level: int = int(payload.get("access_level", 1))
-    embed = await rag.embed_text_async(req.query)
     allowed_types = rag.allowed_doc_types(access_level)
-    print("[DEBUG] Allowed doc types:", allowed_types)
     if not allowed_types:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to access the relevant information.")
 
-    chunks = await rag.vector_search(db, embed, allowed_types, top_k=3)
-    print(f"[DEBUG] Retrieved {len(chunks)} raw chunks for answer")
-
-    # Determine access visibility for chunks
-    vis_list = [rag.ACCESS_MATRIX.get(c["document_type"], {}).get(access_level, rag.AccessType.NONE) for c in chunks]
-    print("[DEBUG] Visibility list:", vis_list)
-
-    only_limited = chunks and all(v in (rag.AccessType.SUMMARY, rag.AccessType.RELEVANT) for v in vis_list)
-    print("[DEBUG] Only limited access chunks:", only_limited)
-    if only_limited:
-        # Build simple answer: each allowed chunk content with citation (no LLM)
-        direct_answer = rag.build_context(chunks, access_level)
-        print("[DEBUG] Direct answer built (Summary/Relevant only)")
-
-        # History logging for direct answer branch
-        from ..services import history_service as history_srv
-        session_id = req.session_id or uuid4()
-        ip_addr = request.client.host if request.client else None
-        await history_srv.log_history(
-            db,
-            user_id=UUID(payload.get("sub")),
-            session_id=session_id,
-            route="answer",
-            query_text=req.query,
-            response_text=json.dumps([{"query": req.query, "answer": direct_answer}], ensure_ascii=False),
-            ip_address=ip_addr,
-        )
+    per_query = await rag.retrieve_chunks_batch(read_db, req.queries, access_level, top_k=3)
 
-        return AnswerResponse(query=req.query, answer=direct_answer)
+    results = [
+        RetrieveResponse(query=query, chunks=_chunk_responses(chunks, access_level))
+        for query, chunks in zip(req.queries, per_query)
+    ]
 
-    context = rag.build_context(chunks, access_level)
-    print("[DEBUG] Context length:", len(context))
+    # -------------------------------------------------------------
+    # Persist history (one row per query, single multi-row insert)
+    # -------------------------------------------------------------
+    session_id = req.session_id or uuid4()
+    ip_addr = request.client.host if request.client else None
+    user_id = UUID(payload.get("sub"))
+    await record_history(
+        db,
+        [
+            dict(
+                user_id=user_id,
+                session_id=session_id,
+                route="retrieve",
+                query_text=res.query,
+                response_payload=history_srv.retrieve_payload([c.dict() for c in res.chunks], access_level),
+                ip_address=ip_addr,
+            )
+            for res in results
+        ],
+    )
 
-    if not context:
-        if chunks:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to access the relevant information.")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No relevant context found.")
+    return BatchRetrieveResponse(results=results)
 
-    llm = load_llm()
-    answer_text = await generate_answer_async(llm, req.query, context)
-    print("[DEBUG] LLM answer generated, length:", len(answer_text))
 
-    # determine session id
-    session_id = req.session_id or uuid4()
+class AnswerResponse(BaseModel):
+    query: str
+    answer: str
 
-    # after generating answer_text or direct_answer; place history logging accordingly.
 
-    # We'll adjust accordingly below
+@router.post("/answer", response_model=AnswerResponse)
+async def answer_query(req: QueryRequest, request: Request, db: AsyncSession = Depends(get_db), read_db: AsyncSession = Depends(get_read_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Generate LLM answer using RAG context respecting access level."""
+    print("[DEBUG] /rag/answer called by", payload.get("username"))
+    print("[DEBUG] Query:", req.query)
 
-    ip_addr = request.client.host if request.client else None
+    access_level: int = int(payload.get("access_level", 1))
+    plan = await answer_srv.plan_answer(read_db, req.query, access_level)
+
+    answer_text = plan.answer
+    if plan.needs_llm:
+        llm = load_llm()
+        cancel = Cancellation(timeout=settings.LLM_REQUEST_DEADLINE_SECONDS)
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, cancel))
+        try:
+            answer_text = await generate_answer_async(llm, req.query, plan.context, cancel)
+        finally:
+            watcher.cancel()
+        if cancel.reason == "deadline":
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Answer generation timed out.")
+        if cancel.reason == "disconnect":
+            print("[DEBUG] Client disconnected; generation cancelled")
+            raise HTTPException(status_code=499, detail="Client closed request")
+        print("[DEBUG] LLM answer generated, length:", len(answer_text))
+        answer_srv.remember_answer(plan, answer_text)
 
     # -------------------------------------------------------------
     # Persist history
     # -------------------------------------------------------------
-    from ..services import history_service as history_srv
-
-    await history_srv.log_history(
+    await answer_srv.record_answer(
         db,
         user_id=UUID(payload.get("sub")),
-        session_id=session_id,
-        route="answer",
-        query_text=req.query,
-        response_text=json.dumps([{"query": req.query, "answer": answer_text}], ensure_ascii=False),
-        ip_address=ip_addr,
+        session_id=req.session_id or uuid4(),
+        query=req.query,
+        answer=answer_text,
+        ip_address=request.client.host if request.client else None,
     )
 
-    return AnswerResponse(query=req.query, answer=answer_text) 
\ No newline at end of file
+    return AnswerResponse(query=req.query, answer=answer_text)
+
+
+class AnswerJobResponse(BaseModel):
+    job_id: UUID
+    status: str  # queued | running | done | failed
+    query: str
+    session_id: UUID
+    answer: Optional[str] = None
+    source: Optional[str] = None
+    citations: List[str] = []
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+def _job_response(job: jobs_srv.AnswerJob) -> AnswerJobResponse:
+    return AnswerJobResponse(
+        job_id=job.id,
+        status=job.status,
+        query=job.query,
+        session_id=job.session_id,
+        answer=job.answer,
+        source=job.source,
+        citations=job.citations,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.post("/answer/jobs", response_model=AnswerJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_answer_job(req: QueryRequest, request: Request, read_db: AsyncSession = Depends(get_read_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Start /rag/answer in the background and return a job to poll.
+
+    Retrieval and access checks run immediately, so 403/404 (and 503 when the
+    LLM queue is full) are returned here; only generation is deferred.
+    """
+    print("[DEBUG] /rag/answer/jobs called by", payload.get("username"))
+
+    access_level: int = int(payload.get("access_level", 1))
+    plan = await answer_srv.plan_answer(read_db, req.query, access_level)
+    if plan.needs_llm:
+        llm_scheduler.admit()
+
+    try:
+        job = jobs_srv.job_store.create(UUID(payload.get("sub")), req.session_id or uuid4(), req.query)
+    except OverflowError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many answer jobs, please retry later.")
+    jobs_srv.job_store.spawn(jobs_srv.run_job(job, plan, request.client.host if request.client else None))
+    return _job_response(job)
+
+
+@router.get("/answer/jobs/{job_id}", response_model=AnswerJobResponse)
+async def get_answer_job(job_id: UUID, payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Status and, once done, the answer of a job started by the current user."""
+    job = jobs_srv.job_store.get(job_id, UUID(payload.get("sub")))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found or expired")
+    return _job_response(job)
+
+
+async def _cancel_on_disconnect(request: Request, cancel: Cancellation) -> None:
+    """Poll the connection while generating; cancel decoding once the client is gone."""
+    while cancel.check() is None:
+        if await request.is_disconnected():
+            cancel.cancel("disconnect")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _answer_events(
+    query: str,
+    plan: answer_srv.AnswerPlan,
+    session_id: UUID,
+    user_id: UUID,
+    ip_addr: Optional[str],
+    release_slot,
+):
+    """SSE body of /rag/answer/stream; releases *release_slot* however the stream ends."""
+    try:
+        yield _sse("meta", {"query": query, "session_id": str(session_id), "source": plan.source})
+        if plan.needs_llm:
+            parts: List[str] = []
+            started = time.perf_counter()
+            cancel = Cancellation(timeout=settings.LLM_REQUEST_DEADLINE_SECONDS)
+            try:
+                # aclosing: a client disconnect stops decoding now, not when the generator is collected
+                async with aclosing(astream_answer(load_llm(), query, plan.context, cancel)) as pieces:
+                    async for piece in pieces:
+                        if not parts:
+                            metrics.observe("llm.time_to_first_token_seconds", time.perf_counter() - started)
+                        parts.append(piece)
+                        yield _sse("token", {"text": piece})
+            except Exception as exc:
+                print("[DEBUG] Streaming generation failed:", exc)
+                yield _sse("error", {"detail": "Answer generation failed."})
+                return
+            finally:
+                release_slot()
+            if cancel.reason == "deadline":
+                yield _sse("error", {"detail": "Answer generation timed out."})
+                return
+            answer_text = "".join(parts).strip()
+            answer_srv.remember_answer(plan, answer_text)
+        else:
+            answer_text = plan.answer
+            yield _sse("token", {"text": answer_text})
+
+        yield _sse("citations", {"citations": plan.citations})
+
+        # The request-scoped session is already closed while the body streams
+        async with async_session_factory() as session:
+            await answer_srv.record_answer(
+                session,
+                user_id=user_id,
+                session_id=session_id,
+                query=query,
+                answer=answer_text,
+                ip_address=ip_addr,
+            )
+        yield _sse("done", {"answer_length": len(answer_text)})
+    finally:
+        # Client gone before generation started (e.g. right after ``meta``)
+        if release_slot is not None:
+            release_slot()
+
+
+@router.post("/answer/stream")
+async def answer_query_stream(req: QueryRequest, request: Request, read_db: AsyncSession = Depends(get_read_db), payload: Dict[str, Any] = Depends(get_current_token_payload)):
+    """Server-Sent Events variant of /rag/answer.
+
+    Events: ``meta`` (session id), ``token`` (text piece, repeated),
+    ``citations`` (citation strings of the context chunks), ``done``;
+    ``error`` replaces the remaining events if generation fails. Retrieval
+    errors (403/404) are returned as regular HTTP errors before streaming starts.
+    History is written once the stream completes.
+    """
+    print("[DEBUG] /rag/answer/stream called by", payload.get("username"))
+    print("[DEBUG] Query:", req.query)
+
+    access_level: int = int(payload.get("access_level", 1))
+    plan = await answer_srv.plan_answer(read_db, req.query, access_level)
+
+    session_id = req.session_id or uuid4()
+    user_id = UUID(payload.get("sub"))
+    ip_addr = request.client.host if request.client else None
+
+    # Admission happens before the response starts so overload is a plain 503
+    release_slot = await llm_scheduler.acquire() if plan.needs_llm else None
+    events = _answer_events(req.query, plan, session_id, user_id, ip_addr, release_slot)
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also release when the body is never iterated (release is idempotent)
+        background=BackgroundTask(release_slot) if release_slot else None,
+    )
@@ -0,0 +1,183 @@
+"""
+Compiled Access Policy
+Single source of truth for the access matrix at query time.
+
+The matrix from ``app.models.ACCESS_MATRIX`` (or the ``access_level_matrix``
+SQL view) is compiled once into per-level lookup tables and SQL ``CASE``
+expressions, so request handlers neither walk the dict per chunk nor branch on
+visibility in Python: Postgres returns the visible content column directly.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, literal, null, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ACCESS_MATRIX, AccessType, DocumentChunk
+
+RELEVANT_SNIPPET_CHARS = 400
+
+
+def content_for_access(chunk: Dict[str, Any], access_type: str) -> Optional[str]:
+    """Content of a chunk loaded with all content columns, as seen with *access_type*."""
+    if access_type == AccessType.NONE:
+        return None
+    if access_type == AccessType.SUMMARY:
+        return chunk.get("summary")
+    if access_type == AccessType.RELEVANT:
+        labels = chunk.get("generated_labels")
+        if labels:
+            return ", ".join(labels)
+        if chunk.get("summary"):
+            return chunk["summary"]
+        raw = chunk.get("text_content") or ""
+        return raw[:RELEVANT_SNIPPET_CHARS] + ("…" if len(raw) > RELEVANT_SNIPPET_CHARS else "")
+    return chunk.get("text_content")
+
+
+class AccessPolicy:
+    """Immutable, precomputed view of an access matrix (document type -> level -> access type)."""
+
+    def __init__(self, matrix: Dict[str, Dict[int, str]], version: Optional[str] = None) -> None:
+        self.matrix: Dict[str, Dict[int, str]] = {dt: dict(levels) for dt, levels in matrix.items()}
+        self.version = version or _digest(self.matrix)
+        self.levels: Tuple[int, ...] = tuple(sorted({lvl for levels in self.matrix.values() for lvl in levels}))
+
+        self._allowed: Dict[int, Tuple[str, ...]] = {}
+        self._by_access: Dict[int, Dict[str, Tuple[str, ...]]] = {}
+        for lvl in self.levels:
+            grouped: Dict[str, List[str]] = {}
+            for dt, levels in self.matrix.items():
+                grouped.setdefault(levels.get(lvl, AccessType.NONE), []).append(dt)
+            self._by_access[lvl] = {acc: tuple(types) for acc, types in grouped.items()}
+            self._allowed[lvl] = tuple(dt for dt in self.matrix if self.matrix[dt].get(lvl, AccessType.NONE) != AccessType.NONE)
+
+    # ------------------------------------------------------------------
+    # Python-side lookups
+    # ------------------------------------------------------------------
+    def access(self, document_type: str, level: int) -> str:
+        """Access type *level* has on *document_type* (``none`` when unknown)."""
+        return self.matrix.get(document_type, {}).get(level, AccessType.NONE)
+
+    def allowed_types(self, level: int) -> List[str]:
+        """Document types with any visibility for *level*."""
+        return list(self._allowed.get(level, ()))
+
+    def types_with(self, level: int, access_type: str) -> Tuple[str, ...]:
+        return self._by_access.get(level, {}).get(access_type, ())
+
+    def resolve_content(self, chunk: Dict[str, Any], level: int) -> Optional[str]:
+        """Python equivalent of :meth:`content_expr` for rows loaded with all content columns.
+
+        Priority:
+        1. FULL      -> raw full text (text_content)
+        2. SUMMARY   -> summary field
+        3. RELEVANT  -> generated labels; else summary; else first 400 chars
+        4. NONE      -> None (filtered out later)
+        """
+        return content_for_access(chunk, self.access(chunk["document_type"], level))
+
+    # ------------------------------------------------------------------
+    # SQL-side expressions
+    # ------------------------------------------------------------------
+    def content_expr(self, level: int):
+        """``CASE`` over ``document_type`` yielding the content column *level* may see (NULL if hidden).
+
+        Only the matching branch is evaluated, so large TOASTed texts are read
+        solely for rows whose visibility is FULL (or RELEVANT without labels
+        and summary, where just the first 400 chars are used).
+        """
+        dc = DocumentChunk
+        relevant = func.coalesce(
+            func.nullif(func.array_to_string(dc.generated_labels, ", "), ""),
+            func.nullif(dc.summary, ""),
+            func.concat(
+                func.substr(dc.text_content, 1, RELEVANT_SNIPPET_CHARS),
+                case((func.length(dc.text_content) > RELEVANT_SNIPPET_CHARS, literal("…")), else_=literal("")),
+            ),
+        )
+        branches = [
+            (AccessType.FULL, dc.text_content),
+            (AccessType.SUMMARY, dc.summary),
+            (AccessType.RELEVANT, relevant),
+        ]
+        whens = [(dc.document_type.in_(types), expr) for acc, expr in branches if (types := self.types_with(level, acc))]
+        return case(*whens, else_=null()) if whens else null()
+
+    def fallback_expr(self, level: int):
+        """``summary`` for rows *level* sees in FULL (NULL otherwise) – the shorter stand-in
+        used when the full text does not fit the prompt budget."""
+        dc = DocumentChunk
+        types = self.types_with(level, AccessType.FULL)
+        return case((dc.document_type.in_(types), dc.summary), else_=null()) if types else null()
+
+    def access_expr(self, level: int):
+        """``CASE`` over ``document_type`` yielding the access type label for *level*."""
+        dc = DocumentChunk
+        whens = [
+            (dc.document_type.in_(types), literal(acc))
+            for acc in (AccessType.FULL, AccessType.SUMMARY, AccessType.RELEVANT)
+            if (types := self.types_with(level, acc))
+        ]
+        return case(*whens, else_=literal(AccessType.NONE)) if whens else literal(AccessType.NONE)
+
+
+def _digest(matrix: Dict[str, Dict[int, str]]) -> str:
+    canonical = json.dumps({dt: {str(k): v for k, v in sorted(m.items())} for dt, m in sorted(matrix.items())})
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def _display_name(document_type: str) -> str:
+    """``regulatory_docs`` (SQL view) -> ``Regulatory Docs`` (document_chunks.document_type)."""
+    return " ".join(part.capitalize() for part in document_type.split("_"))
+
+
+def policy_from_rows(rows: Iterable[Tuple[str, int, str]]) -> AccessPolicy:
+    """Build a policy from ``(document_type, user_level, access_type)`` rows of the SQL view."""
+    matrix: Dict[str, Dict[int, str]] = {}
+    for document_type, user_level, access_type in rows:
+        matrix.setdefault(_display_name(document_type), {})[int(user_level)] = access_type.lower()
+    return AccessPolicy(matrix)
+
+
+_policy = AccessPolicy(ACCESS_MATRIX)
+
+
+def get_policy() -> AccessPolicy:
+    """Return the process-wide compiled policy."""
+    return _policy
+
+
+def set_policy(policy: AccessPolicy) -> None:
+    """Swap the active policy and drop caches that were filled under the old one."""
+    global _policy
+    if policy.version == _policy.version:
+        return
+    from app.services.cache_service import answer_cache, retrieval_cache
+
+    _policy = policy
+    retrieval_cache.clear()
+    answer_cache.clear()
+
+
+async def load_policy_from_db(db: AsyncSession) -> AccessPolicy:
+    """Load the matrix from the ``access_level_matrix`` view and make it the active policy.
+
+    The policy version is a digest of the view's rows, so any edit to the view
+    yields a new version. Falls back to the built-in matrix if the view is
+    unavailable.
+    """
+    try:
+        result = await db.execute(text("SELECT document_type, user_level, access_type FROM access_level_matrix"))
+        rows = result.fetchall()
+    except Exception as exc:
+        print("[DEBUG] access_level_matrix unavailable, keeping built-in policy:", exc)
+        return _policy
+    if rows:
+        set_policy(policy_from_rows(rows))
+    print("[DEBUG] Access policy version:", _policy.version)
+    return _policy
@@ -0,0 +1,147 @@
+"""
+Answer Jobs
+Background /rag/answer generations: ``POST /rag/answer/jobs`` returns a job id
+at once, the client polls ``GET /rag/answer/jobs/{id}``.
+
+Jobs wait on the same LLM scheduler as synchronous answers (so they count
+against ``LLM_MAX_QUEUE``), but with the longer ``ANSWER_JOB_QUEUE_TIMEOUT_SECONDS``.
+Results live in process memory for ``ANSWER_JOB_TTL_SECONDS`` after they
+finish; history is written when a job completes. With several uvicorn
+workers, polls must reach the worker that accepted the job (sticky routing).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from uuid import UUID, uuid4
+
+from app.config import settings
+from app.database import async_session_factory
+from app.services import answer_service as answer_srv
+from app.services.answer_service import AnswerPlan
+from app.services.llm_scheduler import llm_scheduler
+from app.services.llm_service import Cancellation, generate_answer_in_slot, load_llm
+from app.services.metrics import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class AnswerJob:
+    id: UUID
+    user_id: UUID
+    session_id: UUID
+    query: str
+    status: str = QUEUED
+    answer: Optional[str] = None
+    source: Optional[str] = None
+    citations: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[float] = None  # monotonic; set when the job finishes
+
+
+class JobStore:
+    """In-memory jobs keyed by id; finished jobs expire after *ttl* seconds."""
+
+    def __init__(self, ttl: float, max_jobs: int) -> None:
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: Dict[UUID, AnswerJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for job_id in [j.id for j in self._jobs.values() if j.expires_at is not None and j.expires_at <= now]:
+            del self._jobs[job_id]
+
+    def create(self, user_id: UUID, session_id: UUID, query: str) -> AnswerJob:
+        self._purge()
+        if len(self._jobs) >= self.max_jobs:
+            raise OverflowError("Too many answer jobs")
+        job = AnswerJob(id=uuid4(), user_id=user_id, session_id=session_id, query=query)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: UUID, user_id: UUID) -> Optional[AnswerJob]:
+        """The job if it exists, has not expired and belongs to *user_id*."""
+        self._purge()
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def finish(self, job: AnswerJob, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        job.expires_at = time.monotonic() + self.ttl
+        metrics.inc(f"answer_jobs.{status}")
+
+    def spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)  # keep a reference until the task is done
+        task.add_done_callback(self._tasks.discard)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"stored": len(self._jobs), "running_tasks": len(self._tasks), **counts}
+
+
+job_store = JobStore(ttl=settings.ANSWER_JOB_TTL_SECONDS, max_jobs=settings.ANSWER_JOB_MAX_JOBS)
+metrics.register("answer_jobs", job_store.stats)
+
+
+async def run_job(job: AnswerJob, plan: AnswerPlan, ip_address: Optional[str]) -> None:
+    """Generate (if needed), store the result on *job* and write history.
+
+    Generation gets the same ``LLM_REQUEST_DEADLINE_SECONDS`` deadline as
+    /rag/answer; cancelling the task (shutdown) stops decoding as well.
+    """
+    try:
+        answer_text = plan.answer
+        if plan.needs_llm:
+            release = await llm_scheduler.acquire(timeout=settings.ANSWER_JOB_QUEUE_TIMEOUT_SECONDS)
+            job.status = RUNNING
+            cancel = Cancellation(timeout=settings.LLM_REQUEST_DEADLINE_SECONDS)
+            try:
+                answer_text = await generate_answer_in_slot(load_llm(), job.query, plan.context, cancel)
+            finally:
+                release()
+            if cancel.reason == "deadline":
+                job.error = "Answer generation timed out."
+                job_store.finish(job, FAILED)
+                return
+            answer_srv.remember_answer(plan, answer_text)
+
+        async with async_session_factory() as session:
+            await answer_srv.record_answer(
+                session,
+                user_id=job.user_id,
+                session_id=job.session_id,
+                query=job.query,
+                answer=answer_text,
+                ip_address=ip_address,
+            )
+        job.answer, job.source, job.citations = answer_text, plan.source, plan.citations
+        job_store.finish(job, DONE)
+    except asyncio.CancelledError:
+        job.error = "Cancelled during shutdown."
+        job_store.finish(job, FAILED)
+        raise
+    except Exception as exc:
+        print(f"[DEBUG] Answer job {job.id} failed:", exc)
+        job.error = getattr(exc, "reason", None) or "Answer generation failed."
+        job_store.finish(job, FAILED)
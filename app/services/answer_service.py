@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional
+from uuid import UUID
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.services import history_service as history_srv
+from app.services.history_writer import record_history
+from app.services import rag_service as rag
+from app.services.cache_service import answer_cache
+from app.services.llm_service import NO_INFO_ANSWER
+from app.services.metrics import metrics
+
+FORBIDDEN_DETAIL = "You do not have permission to access the relevant information."
+
+
+@dataclass
+class AnswerPlan:
+    """Everything /rag/answer needs before (and instead of) calling the LLM.
+
+    ``answer`` is already set when no generation is required: the user only
+    sees summary/relevant chunks (direct answer), nothing retrieved is close
+    enough (no_info), or the semantic cache hit.
+    """
+
+    query: str
+    access_level: int
+    embed: np.ndarray
+    chunks: List[Dict[str, Any]]
+    context: str = ""
+    answer: Optional[str] = None
+    source: str = "llm"  # llm | direct | cache | no_info
+    context_ids: FrozenSet[str] = frozenset()
+    corpus_version: Optional[int] = None
+    language: str = "en"  # detected query language: relevance threshold and answer-cache key
+    citations: List[str] = field(default_factory=list)
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.answer is None
+
+
+async def plan_answer(read_db: AsyncSession, query: str, access_level: int) -> AnswerPlan:
+    """Retrieve context for *query* and decide whether the LLM has to run.
+
+    Raises 403/404 ``HTTPException`` exactly like the synchronous route did.
+    """
+    allowed_types = rag.allowed_doc_types(access_level)
+    print("[DEBUG] Allowed doc types:", allowed_types)
+    if not allowed_types:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=FORBIDDEN_DETAIL)
+
+    embed, chunks = await rag.retrieve_chunks(read_db, query, access_level, top_k=3)
+    print(f"[DEBUG] Retrieved {len(chunks)} raw chunks for answer")
+
+    plan = AnswerPlan(query=query, access_level=access_level, embed=embed, chunks=chunks)
+    plan.language = rag.detect_language(query)
+
+    # Nothing close enough: answer like the model would, without spending LLM time
+    if rag.nothing_relevant(chunks, plan.language):
+        metrics.inc("answer.no_info_short_circuit")
+        metrics.inc(f"answer.no_info_short_circuit.{plan.language}")
+        print(f"[DEBUG] Best distance {chunks[0]['distance']:.3f} above threshold ({plan.language}); skipping LLM")
+        plan.answer, plan.source = NO_INFO_ANSWER, "no_info"
+        return plan
+
+    # Determine access visibility for chunks
+    vis_list = [rag.chunk_access(c, access_level) for c in chunks]
+    print("[DEBUG] Visibility list:", vis_list)
+
+    only_limited = chunks and all(v in (rag.AccessType.SUMMARY, rag.AccessType.RELEVANT) for v in vis_list)
+    print("[DEBUG] Only limited access chunks:", only_limited)
+    if only_limited:
+        # Build simple answer: each allowed chunk content with citation (no LLM)
+        plan.answer, used = rag.assemble_context(chunks, access_level)
+        plan.source = "direct"
+        plan.citations = [rag.chunk_citation(c) for c in used]
+        print("[DEBUG] Direct answer built (Summary/Relevant only)")
+        return plan
+
+    plan.context, used = rag.assemble_context(chunks, access_level, settings.LLM_CONTEXT_TOKEN_BUDGET)
+    plan.context_ids = frozenset(str(c["chunk_id"]) for c in used)
+    plan.citations = [rag.chunk_citation(c) for c in used]
+    print("[DEBUG] Context length:", len(plan.context))
+
+    if not plan.context:
+        if chunks:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=FORBIDDEN_DETAIL)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No relevant context found.")
+
+    # Semantic answer cache: paraphrases with the same visible context reuse a prior answer
+    if settings.ANSWER_CACHE_ENABLED:
+        plan.corpus_version = await rag.get_corpus_version(read_db)
+    if plan.corpus_version is not None:
+        cached = answer_cache.lookup(embed, access_level, plan.context_ids, plan.corpus_version, plan.language)
+        if cached is not None:
+            print("[DEBUG] Semantic answer cache hit")
+            plan.answer, plan.source = cached, "cache"
+    return plan
+
+
+def remember_answer(plan: AnswerPlan, answer: str) -> None:
+    """Store a freshly generated answer in the semantic cache."""
+    if plan.corpus_version is not None:
+        answer_cache.store(plan.embed, plan.access_level, plan.context_ids, plan.corpus_version, plan.language, answer)
+
+
+async def record_answer(
+    db: AsyncSession,
+    *,
+    user_id: UUID,
+    session_id: Optional[UUID],
+    query: str,
+    answer: str,
+    ip_address: Optional[str],
+) -> None:
+    """Persist an /rag/answer exchange to query history."""
+    await record_history(
+        db,
+        [
+            dict(
+                user_id=user_id,
+                session_id=session_id,
+                route="answer",
+                query_text=query,
+                response_payload=history_srv.answer_payload(answer),
+                ip_address=ip_address,
+            )
+        ],
+    )
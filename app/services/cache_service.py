@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.metrics import metrics
+
+
+class LRUCache:
+    """Small thread-safe LRU cache with entry-count, byte-size and TTL limits.
+
+    *sizeof* estimates the footprint of a value in bytes; when it is omitted
+    only *max_entries* bounds the cache. Entries older than *ttl* seconds are
+    treated as misses and dropped on access.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, size, stored_at = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value) if self._sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+def _retrieval_entry_size(value: Any) -> int:
+    """Approximate bytes held by a cached (embedding, chunks) pair."""
+    embed, chunks = value
+    size = getattr(embed, "nbytes", 0)
+    for ch in chunks:
+        for v in ch.values():
+            if isinstance(v, str):
+                size += len(v)
+            elif isinstance(v, (list, tuple)):
+                size += sum(len(x) for x in v if isinstance(x, str))
+            else:
+                size += 16
+    return size
+
+
+# Retrieval results keyed on (normalized query, access level, top_k, corpus version).
+retrieval_cache = LRUCache(
+    max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RETRIEVAL_CACHE_MAX_BYTES,
+    sizeof=_retrieval_entry_size,
+)
+
+
+class SemanticAnswerCache:
+    """Answer cache matched on query-embedding similarity instead of exact text.
+
+    Entries are bucketed by (access level, query language, context chunk ids,
+    corpus version); a lookup only compares against entries in its own bucket
+    and hits when the cosine similarity reaches *threshold*. So a paraphrase is
+    answered from cache only if it is in the same language and retrieval
+    produced exactly the same context for the same access level on the same
+    corpus. Translations of a question are not served from each other's
+    entries: the cached answer is in the language it was asked in. Entries
+    expire after *ttl* seconds and the least recently used are evicted beyond
+    *max_entries*. A newer corpus version drops everything cached for older
+    ones.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, tuple[tuple, np.ndarray, str, float]]" = OrderedDict()
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._next_id = 0
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(embed: np.ndarray) -> np.ndarray:
+        vec = np.asarray(embed, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def _check_version(self, version: int) -> None:
+        if self._version is None or version > self._version:
+            if self._version is not None:
+                self._entries.clear()
+                self._buckets.clear()
+            self._version = version
+
+    def lookup(self, embed: np.ndarray, level: int, chunk_ids: FrozenSet[str], version: int, language: str) -> Optional[str]:
+        query = self._unit(embed)
+        with self._lock:
+            self._check_version(version)
+            bucket_key = (level, language, chunk_ids, version)
+            now = time.monotonic()
+            best_id, best_sim = None, self.threshold
+            for entry_id in list(self._buckets.get(bucket_key, ())):
+                _, vec, _, stored_at = self._entries[entry_id]
+                if now - stored_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                sim = float(np.dot(query, vec))
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                self.misses += 1
+                metrics.inc("answer_cache.misses")
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            metrics.inc("answer_cache.hits")
+            return self._entries[best_id][2]
+
+    def store(self, embed: np.ndarray, level: int, chunk_ids: FrozenSet[str], version: int, language: str, answer: str) -> None:
+        vec = self._unit(embed)
+        with self._lock:
+            self._check_version(version)
+            if version < (self._version or 0):
+                return  # computed against an outdated corpus
+            bucket_key = (level, language, chunk_ids, version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket_key, vec, answer, time.monotonic())
+            self._buckets.setdefault(bucket_key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "corpus_version": self._version,
+            }
+
+    def _remove(self, entry_id: int) -> None:
+        bucket_key = self._entries.pop(entry_id)[0]
+        ids = self._buckets.get(bucket_key)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._buckets[bucket_key]
+
+
+answer_cache = SemanticAnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
+
+metrics.register("retrieval_cache", retrieval_cache.stats)
+metrics.register("answer_cache", answer_cache.stats)
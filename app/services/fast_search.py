@@ -0,0 +1,109 @@
+"""
+Fast-path vector search on raw asyncpg.
+
+Phase one of retrieval (ids, metadata, distances) runs on a dedicated asyncpg
+pool instead of a SQLAlchemy ORM select:
+
+* the pgvector **binary** codec is registered on every pooled connection, so
+  the NumPy query vector is sent as a 4-byte-per-dimension buffer instead of a
+  1024-float Python list rendered as text;
+* the SQL text is constant, so asyncpg's per-connection statement cache keeps
+  it prepared after the first call – no re-parse / re-plan per request;
+* rows come back as plain dicts, the shape phase two (hydration) fills in.
+
+The pools are separate from the SQLAlchemy engines on purpose: with the binary
+codec installed, SQLAlchemy's text-rendered vector parameters would no longer
+encode on those connections. There is one pool per read target (primary or
+replica), so phase one queries the same server the hydrating session reads
+from and never returns hits that server does not have yet.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+SEARCH_SQL = """
+SELECT chunk_id, source_document, entity, language, document_type,
+       main_section_title, sub_section_title,
+       embedding <-> $1 AS distance
+FROM document_chunks
+WHERE document_type = ANY($2::varchar[])
+ORDER BY embedding <-> $1
+LIMIT $3
+"""
+
+
+_pools: Dict[Tuple[Any, ...], Any] = {}  # (host, port, user, database) -> asyncpg pool
+_pool_lock = asyncio.Lock()
+
+
+async def _init_connection(conn) -> None:
+    from pgvector.asyncpg import register_vector  # type: ignore
+
+    await register_vector(conn)
+
+
+async def get_pool(target=None):
+    """Create (once) and return the fast-path pool for *target*.
+
+    *target* is the SQLAlchemy URL of the session's engine (``db.bind.url``);
+    None means the primary from the DB_* settings.
+    """
+    if target is None:
+        key = (settings.DB_HOST, int(settings.DB_PORT), settings.DB_USER, settings.DB_NAME)
+        password = settings.DB_PASSWORD
+    else:
+        key = (target.host, int(target.port or settings.DB_PORT), target.username, target.database)
+        password = target.password
+    pool = _pools.get(key)
+    if pool is None:
+        async with _pool_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                import asyncpg  # type: ignore
+
+                host, port, user, database = key
+                pool = await asyncpg.create_pool(
+                    host=host,
+                    port=port,
+                    user=user,
+                    password=password,
+                    database=database,
+                    min_size=1,
+                    max_size=settings.FAST_SEARCH_POOL_SIZE,
+                    statement_cache_size=settings.FAST_SEARCH_STATEMENT_CACHE_SIZE,
+                    init=_init_connection,
+                )
+                _pools[key] = pool
+    return pool
+
+
+def pool_stats() -> dict:
+    """asyncpg pool statistics per read target for monitoring (see GET /metrics)."""
+    return {
+        f"{host}:{port}": {"size": pool.get_size(), "idle": pool.get_idle_size(), "max_size": pool.get_max_size()}
+        for (host, port, _, _), pool in _pools.items()
+    }
+
+
+async def close_pool() -> None:
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.close()
+
+
+async def fast_vector_search(
+    embed: np.ndarray, allowed_types: List[str], top_k: int, target=None
+) -> List[Dict[str, Any]]:
+    """Top-k chunk metadata and L2 distances for *embed* (no content columns), read from *target*."""
+    pool = await get_pool(target)
+    vector = np.asarray(embed, dtype=np.float32)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(SEARCH_SQL, vector, list(allowed_types), top_k)
+    return [dict(row) for row in rows]
@@ -0,0 +1,153 @@
+"""
+History Partitions
+Maintenance of the monthly ``query_history`` partitions
+(``sql/005_query_history_partitioning.sql``).
+
+* :func:`ensure_partitions` creates the current and the next
+  ``HISTORY_PARTITION_MONTHS_AHEAD`` months; run at API startup and by
+  ``scripts/history_retention.py``, which must be scheduled daily.
+  ``query_history_default`` (DEFAULT partition) catches rows for months that
+  have no partition yet, so inserts never fail; when such a month's partition
+  is created later, its rows are moved out of the default partition
+  (``history.partition_default_rows`` counts them).
+* :func:`expire_partitions` detaches (archive: the partition stays a plain
+  table that can be dumped and dropped later) or drops partitions older than
+  ``HISTORY_RETENTION_MONTHS``.
+
+Both are no-ops while ``query_history`` is not partitioned (migration not
+applied yet).
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.services.metrics import metrics
+
+TABLE = "query_history"
+DEFAULT_PARTITION = f"{TABLE}_default"
+_PARTITION_NAME = re.compile(r"^query_history_y(\d{4})m(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month covered by partition *name*, or None for tables not following the naming scheme."""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def partitions_to_expire(names: List[str], keep_months: int, today: date) -> List[str]:
+    """Partitions whose whole month lies before the last *keep_months* months (current month included)."""
+    cutoff = add_months(month_start(today), -(keep_months - 1))
+    expired = [name for name in names if (partition_month(name) or cutoff) < cutoff]
+    return sorted(expired)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": TABLE},
+    )
+    return bool(result.scalar())
+
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:table) ORDER BY child.relname"
+        ),
+        {"table": TABLE},
+    )
+    return [row[0] for row in result]
+
+
+async def _create_month_partition(conn: AsyncConnection, name: str, month: date) -> None:
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    in_month = f"created_at >= '{month.isoformat()}' AND created_at < '{add_months(month, 1).isoformat()}'"
+    result = await conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    moved = int(result.scalar() or 0)
+    if not moved:
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {TABLE} FOR VALUES {bounds}'))
+        return
+    # Rows already sit in the default partition: attaching would fail, so move them first
+    await conn.execute(text(f'CREATE TABLE "{name}" (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    await conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}'))
+    await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    await conn.execute(text(f'ALTER TABLE {TABLE} ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+    metrics.inc("history.partition_default_rows", moved)
+    print(f"[DEBUG] Moved {moved} rows from {DEFAULT_PARTITION} into {name}")
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Create the default partition and missing partitions from this month to *months_ahead*
+    months ahead; returns the new month partitions."""
+    if not await is_partitioned(conn):
+        print(f"[DEBUG] {TABLE} is not partitioned; skipping partition maintenance")
+        return []
+    existing = set(await list_partitions(conn))
+    if DEFAULT_PARTITION not in existing:
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    first = month_start(today or date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        await _create_month_partition(conn, name, month)
+        created.append(name)
+    if created:
+        print(f"[DEBUG] Created {TABLE} partitions:", ", ".join(created))
+    return created
+
+
+async def default_partition_rows(conn: AsyncConnection) -> int:
+    """Rows waiting in the default partition (non-zero means maintenance fell behind)."""
+    if not await is_partitioned(conn):
+        return 0
+    result = await conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}"))
+    return int(result.scalar() or 0)
+
+
+async def expire_partitions(
+    conn: AsyncConnection,
+    keep_months: int,
+    mode: str = "detach",
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> List[str]:
+    """Detach or drop partitions older than *keep_months*; returns the affected partitions."""
+    if mode not in ("detach", "drop"):
+        raise ValueError(f"Unknown retention mode '{mode}', expected detach or drop")
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+    if not await is_partitioned(conn):
+        print(f"[DEBUG] {TABLE} is not partitioned; skipping partition maintenance")
+        return []
+    expired = partitions_to_expire(await list_partitions(conn), keep_months, today or date.today())
+    if dry_run:
+        return expired
+    for name in expired:
+        await conn.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION "{name}"'))
+        if mode == "drop":
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+    return expired
@@ -1,10 +1,15 @@
-from typing import List, Optional
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, delete, func, null, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import QueryHistory
+from ..models import DocumentChunk, QueryHistory, User
+from .access_policy import content_for_access, get_policy
 
 
 async def log_history(
@@ -15,6 +20,7 @@ async def log_history(
     route: str,
     query_text: str,
     response_text: Optional[str] = None,
+    response_payload: Optional[Dict[str, Any]] = None,
     ip_address: Optional[str] = None,
 ) -> QueryHistory:
     """Insert a new QueryHistory row and return it.
@@ -31,6 +37,7 @@ async def log_history(
         route=route,
         query_text=query_text,
         response_text=response_text,
+        response_payload=response_payload,
         ip_address=ip_address,
     )
     db.add(history)
@@ -39,34 +46,293 @@ async def log_history(
     return history
 
 
-async def list_sessions(db: AsyncSession, *, user_id: UUID) -> List[UUID]:
-    """Return distinct session ids for the given user ordered by last activity (newest first)."""
-    subq = (
+async def log_history_bulk(db: AsyncSession, entries: List[dict]) -> List[QueryHistory]:
+    """Insert several QueryHistory rows with a single commit.
+
+    Each entry takes the same keyword arguments as :func:`log_history`.
+    """
+    rows = []
+    for entry in entries:
+        data = dict(entry)
+        if data.get("session_id") is None:
+            data["session_id"] = uuid4()
+        rows.append(QueryHistory(**data))
+    db.add_all(rows)
+    await db.commit()
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Compact response payloads
+# ---------------------------------------------------------------------------
+
+PAYLOAD_VERSION = 1
+
+
+def content_hash(content: Optional[str]) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()[:16]
+
+
+def retrieve_payload(chunks: List[Dict[str, Any]], level: int) -> Dict[str, Any]:
+    """Compact form of a /rag/retrieve response (``ChunkResponse`` dicts): references, not texts.
+
+    Each chunk keeps its id, the access type *level* had on it and a hash of
+    the content that was returned, so the response can be rebuilt (and a
+    chunk edited since then detected) on read.
+    """
+    policy = get_policy()
+    return {
+        "v": PAYLOAD_VERSION,
+        "chunks": [
+            {
+                "id": str(ch["chunk_id"]),
+                "access": policy.access(ch["document_type"], level),
+                "distance": ch["distance"],
+                "hash": content_hash(ch["content"]),
+            }
+            for ch in chunks
+        ],
+    }
+
+
+def answer_payload(answer: str) -> Dict[str, Any]:
+    """Compact form of a /rag/answer response."""
+    return {"v": PAYLOAD_VERSION, "answer": answer}
+
+
+async def _load_chunks(db: AsyncSession, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    stmt = select(
+        DocumentChunk.chunk_id,
+        DocumentChunk.document_type,
+        DocumentChunk.entity,
+        DocumentChunk.main_section_title,
+        DocumentChunk.sub_section_title,
+        DocumentChunk.text_content,
+        DocumentChunk.summary,
+        DocumentChunk.generated_labels,
+    ).where(DocumentChunk.chunk_id.in_([UUID(chunk_id) for chunk_id in chunk_ids]))
+    rows = (await db.execute(stmt)).mappings().all()
+    return {str(row["chunk_id"]): dict(row) for row in rows}
+
+
+def _rebuild_chunk(ref: Dict[str, Any], chunk: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Imported here: the history router also runs in the api-light role
+    from .rag_service import chunk_citation
+
+    if chunk is None:  # deleted from the corpus since
+        return {"chunk_id": ref["id"], "document_type": None, "citation": None, "content": None, "distance": ref["distance"], "content_changed": True}
+    content = content_for_access(chunk, ref["access"])
+    item = {
+        "chunk_id": ref["id"],
+        "document_type": chunk["document_type"],
+        "citation": chunk_citation(chunk),
+        "content": content,
+        "distance": ref["distance"],
+    }
+    if content_hash(content) != ref["hash"]:
+        # Never show text the user did not receive
+        item["content"] = None
+        item["content_changed"] = True
+    return item
+
+
+async def expand_responses(db: AsyncSession, rows: List[Dict[str, Any]], hydrate: bool = True) -> None:
+    """Rebuild ``response_text`` in place for rows stored with a compact ``response_payload``.
+
+    Answer rows come back in their original JSON shape; retrieve rows reload
+    the referenced chunks (one query per call) and render them with the access
+    type recorded at the time. A chunk whose content no longer matches the
+    recorded hash, or that no longer exists, is returned with ``content: null``
+    and ``"content_changed": true``. Without *hydrate* retrieve rows list only
+    the references (id, access type, distance) and no chunk is loaded.
+    """
+    chunk_ids = {
+        ref["id"]
+        for row in rows
+        if row.get("response_payload")
+        for ref in row["response_payload"].get("chunks", ())
+    }
+    chunks = await _load_chunks(db, list(chunk_ids)) if chunk_ids and hydrate else {}
+    for row in rows:
+        payload = row.pop("response_payload", None)
+        if payload is None:
+            continue
+        if "answer" in payload:
+            response = [{"query": row["query_text"], "answer": payload["answer"]}]
+        elif not hydrate:
+            response = [
+                {"chunk_id": ref["id"], "access": ref["access"], "distance": ref["distance"]}
+                for ref in payload.get("chunks", ())
+            ]
+        else:
+            response = [_rebuild_chunk(ref, chunks.get(ref["id"])) for ref in payload.get("chunks", ())]
+        row["response_text"] = json.dumps(response, ensure_ascii=False)
+
+
+LAST_QUERY_SNIPPET_CHARS = 120
+
+
+def encode_cursor(created_at: datetime, entry_id: UUID) -> str:
+    """Opaque keyset cursor for the row ``(created_at, id)``."""
+    raw = f"{created_at.isoformat()}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, entry_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(entry_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+async def list_session_summaries(
+    db: AsyncSession,
+    *,
+    user_id: UUID,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Newest-first sessions of *user_id* with their last query, in one query.
+
+    ``DISTINCT ON (session_id)`` picks each session's latest entry; sessions
+    are then ordered by that entry's ``(created_at, id)`` and paged by keyset.
+    Returns the page and the cursor for the next page (None on the last one).
+    """
+    latest = (
         select(
-            QueryHistory.session_id.label("sid"),
-            func.max(QueryHistory.created_at).label("last_created_at"),
+            QueryHistory.session_id,
+            QueryHistory.id,
+            func.left(QueryHistory.query_text, LAST_QUERY_SNIPPET_CHARS).label("last_query"),
+            QueryHistory.created_at,
         )
         .where(QueryHistory.user_id == user_id)
-        .group_by(QueryHistory.session_id)
+        .distinct(QueryHistory.session_id)
+        .order_by(QueryHistory.session_id, QueryHistory.created_at.desc(), QueryHistory.id.desc())
         .subquery()
     )
-    stmt = select(subq.c.sid).order_by(subq.c.last_created_at.desc())
-    result = await db.execute(stmt)
-    return [row[0] for row in result.fetchall()]
+    stmt = select(latest).order_by(latest.c.created_at.desc(), latest.c.id.desc()).limit(limit + 1)
+    if cursor:
+        created_at, entry_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(latest.c.created_at, latest.c.id) < tuple_(created_at, entry_id))
+    rows = (await db.execute(stmt)).mappings().all()
+
+    page = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+    return page, next_cursor
+
+
+RESPONSE_PREVIEW_CHARS = 200
+RESPONSE_MODES = ("full", "truncated", "none")
+
+
+def _entry_columns(response_mode: str) -> Tuple[Any, ...]:
+    """Columns of an entry as a view needs them; 'none'/'truncated' avoid shipping the blob."""
+    if response_mode == "none":
+        response = (null().label("response_text"),)
+    elif response_mode == "truncated":
+        response = (
+            func.left(QueryHistory.response_text, RESPONSE_PREVIEW_CHARS).label("response_text"),
+            QueryHistory.response_payload,
+        )
+    else:
+        response = (QueryHistory.response_text, QueryHistory.response_payload)
+    return (
+        QueryHistory.id,
+        QueryHistory.session_id,
+        QueryHistory.route,
+        QueryHistory.query_text,
+        *response,
+        QueryHistory.ip_address,
+        QueryHistory.created_at,
+    )
+
 
+async def session_messages(
+    db: AsyncSession,
+    *,
+    user_id: UUID,
+    session_id: UUID,
+    limit: int,
+    cursor: Optional[str] = None,
+    response_mode: str = "full",
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of a session's history entries, newest first.
 
-async def session_messages(db: AsyncSession, *, user_id: UUID, session_id: UUID) -> List[QueryHistory]:
-    """Fetch all history entries for a session, newest first."""
+    Keyset-paged on ``(created_at, id)``; returns the page and the cursor for
+    the next page (None on the last one).
+    """
     stmt = (
-        select(QueryHistory)
+        select(*_entry_columns(response_mode))
         .where(
             QueryHistory.user_id == user_id,
             QueryHistory.session_id == session_id,
         )
-        .order_by(QueryHistory.created_at.desc())
+        .order_by(QueryHistory.created_at.desc(), QueryHistory.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, entry_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(QueryHistory.created_at, QueryHistory.id) < tuple_(created_at, entry_id))
+    rows = (await db.execute(stmt)).mappings().all()
+
+    page = [dict(row) for row in rows[:limit]]
+    # Previews only list chunk references; the full rebuild is left to /history/entries/{id}
+    await expand_responses(db, page, hydrate=response_mode == "full")
+    if response_mode == "truncated":
+        for row in page:
+            if row["response_text"]:
+                row["response_text"] = row["response_text"][:RESPONSE_PREVIEW_CHARS]
+    next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+    return page, next_cursor
+
+
+async def get_entry(db: AsyncSession, *, user_id: UUID, entry_id: UUID) -> Optional[Dict[str, Any]]:
+    """A single history entry (full response) if it belongs to *user_id*."""
+    stmt = select(*_entry_columns("full")).where(QueryHistory.id == entry_id, QueryHistory.user_id == user_id)
+    row = (await db.execute(stmt)).mappings().first()
+    if row is None:
+        return None
+    entry = dict(row)
+    await expand_responses(db, [entry])
+    return entry
+
+
+async def is_admin(db: AsyncSession, user_id: UUID) -> bool:
+    result = await db.execute(select(User.is_admin).where(User.id == user_id))
+    return bool(result.scalar())
+
+
+EXPORT_COLUMNS = ("id", "user_id", "session_id", "route", "query_text", "response_text", "ip_address", "created_at")
+
+
+async def stream_history(
+    session_factory,
+    *,
+    user_id: UUID,
+    fetch_size: int,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """All history entries of *user_id*, oldest first, in batches of *fetch_size* rows.
+
+    Reads through a server-side cursor (``AsyncSession.stream`` +
+    ``yield_per``), so memory stays bounded however long the history is.
+    Compact payloads are expanded per batch on a second session, since the
+    cursor's connection is busy until the export finishes.
+    """
+    stmt = (
+        select(QueryHistory.user_id, *_entry_columns("full"))
+        .where(QueryHistory.user_id == user_id)
+        .order_by(QueryHistory.created_at, QueryHistory.id)
+        .execution_options(yield_per=fetch_size)
     )
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    async with session_factory() as cursor_db, session_factory() as lookup_db:
+        result = await cursor_db.stream(stmt)
+        async for partition in result.mappings().partitions():
+            rows = [dict(row) for row in partition]
+            await expand_responses(lookup_db, rows)
+            yield rows
 
 
 async def delete_session(db: AsyncSession, *, user_id: UUID, session_id: UUID) -> None:
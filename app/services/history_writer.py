@@ -0,0 +1,196 @@
+"""
+History Writer
+Write-behind logging of query history rows, off the request critical path.
+
+Requests hand their rows to :func:`record_history`; a background task drains
+the queue and writes them with one multi-row ``INSERT`` per batch
+(``HISTORY_BATCH_SIZE`` rows or every ``HISTORY_FLUSH_INTERVAL_SECONDS``).
+``created_at`` is stamped when the row is queued, so ordering and keyset
+pagination are unaffected by when the batch lands.
+
+``HISTORY_DURABILITY`` selects the trade-off:
+
+* ``async`` – return immediately; rows still queued are flushed on graceful
+  shutdown but lost if the process dies. A failed batch is retried
+  ``HISTORY_WRITE_RETRIES`` times before it is dropped and counted as
+  ``history_writer.dropped_rows`` (alert on it);
+* ``ack``   – wait until the row's batch is committed (still batched with
+  concurrent requests, errors reach the caller);
+* ``sync``  – write inline on the request's session, as before.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_factory
+from app.models import QueryHistory
+from app.services import history_service as history_srv
+from app.services.metrics import metrics
+
+DURABILITY_MODES = ("async", "ack", "sync")
+_STOP = object()  # queue marker: flush what came before it, then exit
+
+
+class HistoryWriter:
+    """Queue + background flusher for ``query_history`` rows."""
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        session_factory=async_session_factory,
+        retries: int = 1,
+        retry_delay: float = 0.5,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.session_factory = session_factory
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+        return self._queue
+
+    async def submit(self, rows: List[Dict[str, Any]], wait: bool = False) -> None:
+        """Queue *rows*; with *wait* return only once they are committed."""
+        queue = self._ensure_started()
+        futures = []
+        for row in rows:
+            future = asyncio.get_running_loop().create_future() if wait else None
+            await queue.put((row, future))  # blocks only when HISTORY_QUEUE_MAX rows are pending
+            if future is not None:
+                futures.append(future)
+        if futures:
+            await asyncio.gather(*futures)
+
+    async def _next_batch(self) -> Tuple[List[Tuple[Dict[str, Any], Optional[asyncio.Future]]], bool]:
+        """Up to ``batch_size`` rows, waiting at most ``flush_interval`` after the first; flags the stop marker."""
+        batch = []
+        item = await self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while item is not _STOP:
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                return batch, False
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return batch, False
+        return batch, True
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        async with self.session_factory() as session:
+            await session.execute(insert(QueryHistory), rows)  # executemany -> multi-row INSERT
+            await session.commit()
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]) -> None:
+        rows = [row for row, _ in batch]
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                await self._insert(rows)
+                break
+            except Exception as exc:
+                error = exc
+                metrics.inc("history_writer.write_errors")
+                if attempt < self.retries:
+                    self.retried += 1
+                    print(f"[DEBUG] History batch of {len(rows)} rows failed, retrying:", exc)
+                    await asyncio.sleep(self.retry_delay * (attempt + 1))
+        else:
+            self.failed += len(rows)
+            metrics.inc("history_writer.dropped_rows", len(rows))
+            if "no partition of relation" in str(error):
+                # Default partition missing and partition maintenance fell behind: alert on this
+                metrics.inc("history_writer.no_partition", len(rows))
+            print(f"[DEBUG] History writer dropped {len(rows)} rows:", error)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            return
+        self.written += len(rows)
+        self.batches += 1
+        metrics.observe("history_writer.flush_seconds", time.perf_counter() - started)
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _run(self) -> None:
+        while True:
+            batch, stop = await self._next_batch()
+            if batch:
+                await self._write(batch)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        """Flush everything queued so far and stop the flusher."""
+        if self._task is not None and not self._task.done():
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        if self._queue is not None:
+            leftover = []
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    leftover.append(item)
+            for start in range(0, len(leftover), self.batch_size):
+                await self._write(leftover[start:start + self.batch_size])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "durability": settings.HISTORY_DURABILITY,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "retried_batches": self.retried,
+            "batches": self.batches,
+        }
+
+
+history_writer = HistoryWriter(
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL_SECONDS,
+    max_queue=settings.HISTORY_QUEUE_MAX,
+    retries=settings.HISTORY_WRITE_RETRIES,
+    retry_delay=settings.HISTORY_RETRY_DELAY_SECONDS,
+)
+metrics.register("history_writer", history_writer.stats)
+
+
+async def record_history(db: AsyncSession, entries: List[Dict[str, Any]]) -> None:
+    """Log history *entries* (``log_history`` keyword arguments) per ``HISTORY_DURABILITY``."""
+    if settings.HISTORY_DURABILITY == "sync":
+        await history_srv.log_history_bulk(db, entries)
+        return
+    now = datetime.now(timezone.utc)
+    rows = []
+    for entry in entries:
+        row = {"response_text": None, "response_payload": None, "ip_address": None, **entry, "id": uuid4(), "created_at": now}
+        if row.get("session_id") is None:
+            row["session_id"] = uuid4()
+        rows.append(row)
+    await history_writer.submit(rows, wait=settings.HISTORY_DURABILITY == "ack")
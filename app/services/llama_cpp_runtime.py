@@ -0,0 +1,120 @@
+"""
+llama.cpp runtime (``LLM_RUNTIME=llama_cpp``) with prompt-prefix KV reuse.
+
+Every BankBot prompt starts with the same instruction block (everything in
+``PROMPT_TEMPLATE`` before ``{context}``). llama-cpp-python already reuses the
+longest common token prefix between a new prompt and what its KV cache holds,
+and every request leaves the instruction block at the start of the cache. So
+:class:`LlamaCppModel` only evaluates the block once at load time, and the
+built-in matching does the rest: each request prefills context + question
+only. No KV state is copied per request.
+
+The wrapper keeps the ctransformers call convention (``model(prompt)`` /
+``model(prompt, stream=True)``), so the rest of the LLM layer is unchanged.
+One instance serves one generation at a time (the scheduler guarantees this).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Iterator, List, Optional
+
+from app.services.metrics import metrics
+
+
+class LlamaCppModel:
+    def __init__(
+        self,
+        model_path: str,
+        threads: int,
+        prefix: str = "",
+        context_length: int = 4096,
+        max_new_tokens: int = 150,
+        temperature: float = 0.3,
+        gpu_layers: int = 0,
+    ) -> None:
+        from llama_cpp import Llama  # type: ignore
+
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=context_length,
+            n_threads=threads,
+            n_gpu_layers=gpu_layers,
+            verbose=False,
+        )
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.prefix_tokens: List[int] = []
+        if prefix:
+            self.cache_prefix(prefix)
+
+    def tokenize(self, text: str) -> List[int]:
+        """Token ids of *text* as the model sees it inside a prompt (no BOS)."""
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False)
+
+    def cache_prefix(self, prefix: str) -> None:
+        """Evaluate *prefix* once so the first request already finds it in the KV cache."""
+        tokens = self.llm.tokenize(prefix.encode("utf-8"), add_bos=True)
+        # Keep only tokens that stay identical when the prompt continues after the prefix
+        probe = self.llm.tokenize((prefix + "[[1]] x").encode("utf-8"), add_bos=True)
+        stable = 0
+        for a, b in zip(tokens, probe):
+            if a != b:
+                break
+            stable += 1
+        self.prefix_tokens = tokens[:stable]
+        if not self.prefix_tokens:
+            return
+        started = time.perf_counter()
+        self.llm.reset()
+        self.llm.eval(self.prefix_tokens)
+        print(
+            f"[DEBUG] Cached prompt prefix: {len(self.prefix_tokens)} tokens "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _prefix_cached(self) -> bool:
+        n = len(self.prefix_tokens)
+        return self.llm.n_tokens >= n and list(self.llm.input_ids[:n]) == self.prefix_tokens
+
+    def _completion(self, prompt: str, stream: bool, max_new_tokens: Optional[int], stop: Optional[List[str]]):
+        if self.prefix_tokens:
+            metrics.inc("llm.prefix_cache.hits" if self._prefix_cached() else "llm.prefix_cache.misses")
+        # llama.cpp matches the longest common token prefix with its KV cache,
+        # so only the tokens after the cached prefix are evaluated.
+        return self.llm.create_completion(
+            prompt,
+            max_tokens=max_new_tokens or self.max_new_tokens,
+            temperature=self.temperature,
+            stop=stop or [],
+            stream=stream,
+        )
+
+    def _stream(self, prompt: str, max_new_tokens: Optional[int], stop: Optional[List[str]]) -> Iterator[str]:
+        for chunk in self._completion(prompt, True, max_new_tokens, stop):
+            yield chunk["choices"][0]["text"]
+
+    def __call__(
+        self,
+        prompt: str,
+        stream: bool = False,
+        max_new_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+    ):
+        if stream:
+            return self._stream(prompt, max_new_tokens, stop)
+        return self._completion(prompt, False, max_new_tokens, stop)["choices"][0]["text"]
+
+    def prefill_seconds(self, prompt: str, use_prefix: bool = True) -> float:
+        """Time to evaluate *prompt* up to the first generated token (benchmarks).
+
+        Starts from an empty cache, or from one holding only the instruction
+        block (what every request after the first finds), so tokens left over
+        from the previous call are never reused.
+        """
+        self.llm.reset()
+        if use_prefix and self.prefix_tokens:
+            self.llm.eval(self.prefix_tokens)
+        started = time.perf_counter()
+        self.llm.create_completion(prompt, max_tokens=1, temperature=self.temperature)
+        return time.perf_counter() - started
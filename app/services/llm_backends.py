@@ -0,0 +1,181 @@
+"""
+LLM Backends
+Where generations run, selected with ``LLM_BACKEND``:
+
+* ``local`` – the model inside this process (ctransformers / llama.cpp), or
+  the ``LLM_REPLICAS`` worker-process pool;
+* ``http``  – a separate OpenAI-compatible completion server on the same host
+  (``llama.cpp`` ``llama-server``, vLLM, …). Every API worker shares the one
+  server, which keeps a single copy of the weights and batches concurrent
+  requests continuously.
+
+Both follow the ctransformers call convention the generation loop relies on –
+``backend(prompt, stream=False, max_new_tokens=None, stop=None)`` returns the
+text, or an iterator of text pieces with ``stream=True``. The calls block, so
+they run in worker threads; closing a stream iterator stops the generation.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class LLMBackend(ABC):
+    """Interface shared by all backends."""
+
+    name = "base"
+
+    @abstractmethod
+    def __call__(
+        self,
+        prompt: str,
+        stream: bool = False,
+        max_new_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+    ):
+        raise NotImplementedError
+
+    def tokenizer(self) -> Optional[Callable[[str], List[int]]]:
+        """The model's own ``text -> token ids`` function when it runs in this process."""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBackend(LLMBackend):
+    """In-process model or :class:`~app.services.llm_pool.LLMPool`."""
+
+    name = "local"
+
+    def __init__(self, model) -> None:
+        self.model = model
+
+    def __call__(self, prompt, stream=False, max_new_tokens=None, stop=None):
+        options: Dict[str, Any] = {}
+        if max_new_tokens is not None:
+            options["max_new_tokens"] = max_new_tokens
+        if stop is not None:
+            options["stop"] = stop
+        return self.model(prompt, stream=stream, **options)
+
+    def tokenizer(self) -> Optional[Callable[[str], List[int]]]:
+        # ctransformers models and LlamaCppModel; None for the worker-process pool
+        return getattr(self.model, "tokenize", None)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"backend": self.name}
+        if hasattr(self.model, "stats"):
+            stats.update(self.model.stats())
+        return stats
+
+    def close(self) -> None:
+        if hasattr(self.model, "close"):
+            self.model.close()
+
+
+class HTTPBackend(LLMBackend):
+    """Client for an OpenAI-compatible ``/completions`` endpoint.
+
+    One pooled ``httpx.Client`` (keep-alive connections, thread-safe) is shared
+    by all generation threads. Streaming uses server-sent events; leaving the
+    stream early closes the response, which makes llama.cpp's server abort the
+    slot instead of finishing the answer for nobody.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        timeout: float,
+        max_connections: int,
+        api_key: Optional[str] = None,
+        temperature: float = 0.3,
+        default_max_tokens: int = 150,
+        cache_prompt: bool = True,
+    ) -> None:
+        import httpx
+
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.base_url = base_url
+        self.model = model
+        self.temperature = temperature
+        self.default_max_tokens = default_max_tokens
+        self.cache_prompt = cache_prompt
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()  # generation threads update the counters concurrently
+
+    def _count(self, errors: bool = False) -> None:
+        with self._lock:
+            if errors:
+                self.errors += 1
+            else:
+                self.requests += 1
+
+    def _body(self, prompt: str, stream: bool, max_new_tokens: Optional[int], stop: Optional[List[str]]) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": max_new_tokens or self.default_max_tokens,
+            "temperature": self.temperature,
+            "stream": stream,
+        }
+        if stop:
+            body["stop"] = stop
+        if self.cache_prompt:
+            body["cache_prompt"] = True  # llama.cpp server: reuse the KV cache of the shared prompt prefix
+        return body
+
+    def _stream(self, body: Dict[str, Any]) -> Iterator[str]:
+        self._count()
+        try:
+            with self._client.stream("POST", "/completions", json=body) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    text = json.loads(data)["choices"][0].get("text") or ""
+                    if text:
+                        yield text
+        except Exception:
+            self._count(errors=True)
+            raise
+
+    def __call__(self, prompt, stream=False, max_new_tokens=None, stop=None):
+        body = self._body(prompt, stream, max_new_tokens, stop)
+        if stream:
+            return self._stream(body)
+        self._count()
+        try:
+            response = self._client.post("/completions", json=body)
+            response.raise_for_status()
+            return response.json()["choices"][0]["text"]
+        except Exception:
+            self._count(errors=True)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, errors = self.requests, self.errors
+        return {"backend": self.name, "url": self.base_url, "requests": requests, "errors": errors}
+
+    def close(self) -> None:
+        self._client.close()
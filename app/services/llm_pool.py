@@ -0,0 +1,252 @@
+"""
+LLM Replica Pool
+Runs ``LLM_REPLICAS`` copies of the Yi model in separate worker processes.
+
+Each worker loads its own model with ``LLM_THREADS`` CPU threads and serves one
+generation at a time. The parent side (:class:`LLMPool`) is a drop-in for the
+ctransformers model object – ``pool(prompt)`` / ``pool(prompt, stream=True)`` –
+so ``generate_answer`` / ``astream_answer`` work unchanged:
+
+* each prompt goes to the least-loaded replica (fewest in-flight jobs, then
+  fewest jobs served);
+* tokens flow back over a per-replica response queue and are routed to the
+  waiting caller by job id;
+* a reader thread notices a dead worker, fails its in-flight jobs and starts a
+  replacement process after an exponential backoff. A replica that crashes
+  ``max_restarts`` times in a row without becoming ready (e.g. the model
+  cannot be loaded) is given up (``llm.replica_failed``); once no replica is
+  left, calls raise instead of queueing.
+
+The GGUF file is memory-mapped, so replicas share the weights' page cache;
+extra RAM per replica is mostly the KV cache and scratch buffers.
+"""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+from app.services.metrics import metrics
+
+_READY = "ready"
+_TOKEN = "token"
+_DONE = "done"
+_ERROR = "error"
+
+MAX_RESTART_BACKOFF_SECONDS = 60.0
+
+
+def _worker_main(model_path: str, threads: int, requests, responses, cancel) -> None:
+    """Worker process: load the model once, then serve prompts until ``None`` arrives."""
+    from app.services.llm_service import load_model
+
+    llm = load_model(model_path, threads)
+    responses.put((_READY, 0, None))
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        job_id, prompt, options = item
+        if cancel.value == job_id:
+            responses.put((_DONE, job_id, None))
+            continue
+        try:
+            for piece in llm(prompt, stream=True, **options):
+                if cancel.value == job_id:
+                    break
+                responses.put((_TOKEN, job_id, piece))
+            responses.put((_DONE, job_id, None))
+        except Exception as exc:  # reported to the caller, worker keeps serving
+            responses.put((_ERROR, job_id, repr(exc)))
+
+
+class LLMReplica:
+    """Parent-side handle for one worker process."""
+
+    POLL_SECONDS = 1.0  # reader wake-up interval for liveness checks
+
+    def __init__(self, index: int, model_path: str, threads: int, ctx, max_restarts: int = 5, restart_backoff: float = 1.0) -> None:
+        self.index = index
+        self.model_path = model_path
+        self.threads = threads
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self._ctx = ctx
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, queue.Queue] = {}
+        self._closed = False
+        self.served = 0
+        self.restarts = 0
+        self.crashes = 0  # consecutive crashes since the worker was last ready
+        self.ready = False
+        self.restarting = False
+        self.failed = False
+        self._spawn()
+        self._reader = threading.Thread(target=self._read_loop, name=f"llm-replica-{index}", daemon=True)
+        self._reader.start()
+
+    def _spawn(self) -> None:
+        self.requests = self._ctx.Queue()
+        self.responses = self._ctx.Queue()
+        self.cancel = self._ctx.Value("q", 0)
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_path, self.threads, self.requests, self.responses, self.cancel),
+            name=f"bankbot-llm-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        print(f"[DEBUG] LLM replica {self.index} started (pid={self.process.pid}, threads={self.threads})")
+
+    @property
+    def inflight(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def available(self) -> bool:
+        return not (self.failed or self.restarting or self._closed)
+
+    def submit(self, job_id: int, prompt: str, options: Dict[str, Any], sink: queue.Queue) -> None:
+        with self._lock:
+            if not self.available:
+                raise RuntimeError(f"LLM replica {self.index} is not available")
+            self._jobs[job_id] = sink
+            self.served += 1
+            self.requests.put((job_id, prompt, options))
+
+    def finish(self, job_id: int, completed: bool) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            if not completed:
+                self.cancel.value = job_id  # worker stops at the next token
+
+    def _read_loop(self) -> None:
+        while not self._closed and not self.failed:
+            try:
+                kind, job_id, payload = self.responses.get(timeout=self.POLL_SECONDS)
+            except queue.Empty:
+                if not self._closed and not self.process.is_alive():
+                    self._restart()
+                continue
+            except (EOFError, OSError):
+                if not self._closed:
+                    self._restart()
+                continue
+            if kind == _READY:
+                self.ready = True
+                self.crashes = 0
+                continue
+            sink = self._jobs.get(job_id)
+            if sink is not None:
+                sink.put((kind, payload))
+
+    def _restart(self) -> None:
+        with self._lock:
+            exitcode = self.process.exitcode
+            for sink in self._jobs.values():
+                sink.put((_ERROR, f"LLM worker crashed (exitcode={exitcode})"))
+            self._jobs.clear()
+            self.ready = False
+            self.crashes += 1
+            if self.crashes > self.max_restarts:
+                self.failed = True
+                metrics.inc("llm.replica_failed")
+                print(f"[DEBUG] LLM replica {self.index} died (exitcode={exitcode}) {self.crashes} times in a row; giving up")
+                return
+            self.restarting = True
+        delay = min(self.restart_backoff * 2 ** (self.crashes - 1), MAX_RESTART_BACKOFF_SECONDS)
+        print(f"[DEBUG] LLM replica {self.index} died (exitcode={exitcode}); restarting in {delay:.1f}s")
+        metrics.inc("llm.replica_restarts")
+        time.sleep(delay)
+        with self._lock:
+            if self._closed:
+                return
+            self.restarts += 1
+            self._spawn()
+            self.restarting = False
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._closed = True
+        try:
+            self.requests.put(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._reader.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "ready": self.ready,
+            "inflight": self.inflight,
+            "served": self.served,
+            "restarts": self.restarts,
+            "failed": self.failed,
+        }
+
+
+class LLMPool:
+    """Least-loaded dispatcher over several :class:`LLMReplica` processes."""
+
+    def __init__(self, replicas: int, model_path: str, threads: int, max_restarts: int = 5, restart_backoff: float = 1.0, ctx=None) -> None:
+        ctx = ctx or mp.get_context("spawn")  # never fork a process that holds model / event-loop state
+        self.replicas: List[LLMReplica] = [
+            LLMReplica(i, model_path, threads, ctx, max_restarts=max_restarts, restart_backoff=restart_backoff)
+            for i in range(replicas)
+        ]
+        self._ids = itertools.count(1)
+        self._pick_lock = threading.Lock()
+
+    def _dispatch(self, job_id: int, prompt: str, options: Dict[str, Any], sink: queue.Queue) -> LLMReplica:
+        with self._pick_lock:  # pick + submit atomically so concurrent callers spread out
+            candidates = [r for r in self.replicas if r.available]
+            if not candidates:
+                if all(r.failed for r in self.replicas):
+                    raise RuntimeError("All LLM replicas failed to start; see llm.replica_failed")
+                raise RuntimeError("No LLM replica available (restarting)")
+            replica = min(candidates, key=lambda r: (r.inflight, r.served))
+            replica.submit(job_id, prompt, options, sink)
+        return replica
+
+    def _stream(self, prompt: str, options: Dict[str, Any]) -> Iterator[str]:
+        job_id = next(self._ids)
+        sink: queue.Queue = queue.Queue()
+        replica = self._dispatch(job_id, prompt, options, sink)
+        completed = False
+        try:
+            while True:
+                kind, payload = sink.get()
+                if kind == _TOKEN:
+                    yield payload
+                elif kind == _DONE:
+                    completed = True
+                    return
+                else:
+                    completed = True
+                    raise RuntimeError(payload)
+        finally:
+            replica.finish(job_id, completed)
+
+    def __call__(self, prompt: str, stream: bool = False, **options):
+        """Same calling convention as a ctransformers model (blocking; run in a thread).
+
+        *options* (``max_new_tokens``, ``stop``, …) are forwarded to the worker's model call.
+        """
+        if stream:
+            return self._stream(prompt, options)
+        return "".join(self._stream(prompt, options))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"replicas": [r.stats() for r in self.replicas]}
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.close()
+
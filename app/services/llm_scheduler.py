@@ -0,0 +1,116 @@
+"""
+LLM Scheduler
+Admission control and backpressure in front of the (CPU-bound, not thread-safe) LLM.
+
+At most ``max_concurrency`` generations run at once per scheduler; up to
+``max_queue`` further requests wait in FIFO order. Anything beyond that – or a
+request that waits longer than ``queue_timeout`` – is rejected immediately with
+:class:`SchedulerOverloaded`, which the app turns into ``503`` + ``Retry-After``.
+Under overload latency therefore stays bounded by the queue depth instead of
+every request slowing down together.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.metrics import metrics
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a generation cannot be admitted; carries a Retry-After hint (seconds)."""
+
+    def __init__(self, reason: str, retry_after: int, status_code: int = 503) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, name: str = "llm") -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the average generation time."""
+        summary = metrics.snapshot()["summaries"].get(f"{self.name}.generation_seconds")
+        avg = summary["avg"] if summary and summary["count"] else 10.0
+        return max(1, math.ceil(avg * (self.waiting + 1) / self.max_concurrency))
+
+    def admit(self) -> None:
+        """Raise :class:`SchedulerOverloaded` if a new request could not even be queued."""
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            metrics.inc(f"{self.name}.rejected_queue_full")
+            raise SchedulerOverloaded("LLM queue is full", self.retry_after())
+
+    async def acquire(self, timeout: Optional[float] = None) -> Callable[[], None]:
+        """Wait for a generation slot; returns the release callable (call exactly once).
+
+        *timeout* overrides the configured queue timeout (background jobs wait longer).
+        """
+        self.admit()
+        started = time.monotonic()
+        if not self._sem.locked():
+            await self._sem.acquire()  # free slot: no queueing
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), timeout=self.queue_timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                metrics.inc(f"{self.name}.rejected_queue_timeout")
+                raise SchedulerOverloaded("Timed out waiting for the LLM", self.retry_after())
+            finally:
+                self.waiting -= 1
+        metrics.observe(f"{self.name}.queue_wait_seconds", time.monotonic() - started)
+
+        self.active += 1
+        admitted = time.monotonic()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.active -= 1
+            metrics.observe(f"{self.name}.generation_seconds", time.monotonic() - admitted)
+            self._sem.release()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+        }
+
+
+# Local: concurrency per model instance × instances. HTTP: set LLM_MAX_CONCURRENCY to the server's parallel slots.
+_instances = max(1, settings.LLM_REPLICAS) if settings.LLM_BACKEND == "local" else 1
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY * _instances,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+)
+metrics.register("llm_scheduler", llm_scheduler.stats)
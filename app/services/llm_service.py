@@ -1,28 +1,99 @@
 from functools import lru_cache
+import asyncio
 import os
+import threading
+import time
 from asyncio import to_thread
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, List, Optional
 
-from ctransformers import AutoModelForCausalLM  # type: ignore
+from app.config import settings
+
+from .llm_backends import HTTPBackend, LLMBackend, LocalBackend
+from .llm_scheduler import llm_scheduler
+from .metrics import metrics
+from .token_counter import count_tokens, use_model_tokenizer
+
+LLM_CONTEXT_LENGTH = 4096
+
+def yi_model_path() -> str:
+    return os.getenv("YI_MODEL_PATH", "./models/yi-1.5-9b-chat/Yi-1.5-9B-Chat-Q4_K_M.gguf")
+
+
+def load_model(model_path: str, threads: int):
+    """Load one Yi model instance (also used inside LLM pool worker processes)."""
+    if settings.LLM_RUNTIME == "llama_cpp":
+        from .llama_cpp_runtime import LlamaCppModel
+
+        return LlamaCppModel(
+            model_path,
+            threads,
+            prefix=PROMPT_PREFIX if settings.LLM_PREFIX_CACHE else "",
+            context_length=LLM_CONTEXT_LENGTH,
+            max_new_tokens=150,
+            temperature=0.3,
+        )
+    from ctransformers import AutoModelForCausalLM  # type: ignore  # heavy, imported on first load
 
-@lru_cache(maxsize=1)
-def load_llm():
-    model_path = os.getenv(
-        "YI_MODEL_PATH", "./models/yi-1.5-9b-chat/Yi-1.5-9B-Chat-Q4_K_M.gguf"
-    )
     return AutoModelForCausalLM.from_pretrained(
         model_path,
         model_type="llama",
         gpu_layers=32,  # default CPU; adjust by env
-        context_length=4096,
+        context_length=LLM_CONTEXT_LENGTH,
         max_new_tokens=150,
         temperature=0.3,
-        threads=8,
+        threads=threads,
     )
 
 
-def generate_answer(llm, query: str, context: str) -> str:
-    print(f"Generating answer for query: {query}")
-    prompt = f"""
+@lru_cache(maxsize=1)
+def load_llm() -> LLMBackend:
+    """The configured LLM backend (see ``app.services.llm_backends``).
+
+    ``LLM_BACKEND=http`` talks to a shared completion server; otherwise the
+    model runs in this process, or in ``LLM_REPLICAS`` worker processes.
+    """
+    if settings.LLM_BACKEND == "http":
+        backend: LLMBackend = HTTPBackend(
+            settings.LLM_HTTP_URL,
+            model=settings.LLM_HTTP_MODEL,
+            timeout=settings.LLM_HTTP_TIMEOUT_SECONDS,
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            api_key=settings.LLM_HTTP_API_KEY,
+            cache_prompt=settings.LLM_PREFIX_CACHE,
+        )
+    else:
+        model_path = yi_model_path()
+        if settings.LLM_REPLICAS > 0:
+            from .llm_pool import LLMPool
+
+            model = LLMPool(
+                settings.LLM_REPLICAS,
+                model_path,
+                settings.LLM_THREADS,
+                max_restarts=settings.LLM_REPLICA_MAX_RESTARTS,
+                restart_backoff=settings.LLM_REPLICA_RESTART_BACKOFF_SECONDS,
+            )
+        else:
+            model = load_model(model_path, settings.LLM_THREADS)
+        backend = LocalBackend(model)
+    use_model_tokenizer(backend.tokenizer())
+    metrics.register("llm_backend", backend.stats)
+    return backend
+
+
+def close_llm() -> None:
+    """Stop LLM worker processes / close the HTTP client if a backend was created."""
+    if load_llm.cache_info().currsize:
+        load_llm().close()
+        load_llm.cache_clear()
+
+
+# Rule 5 of the prompt; generation stops as soon as the model has written it
+NO_INFO_ANSWER = "I don't have enough information in my current knowledge base to answer that."
+
+PROMPT_TEMPLATE = """
 [INST]
 You are BankBot, an enterprise banking assistant.
 TASK:
@@ -39,9 +110,219 @@ TASK:
 {query}
 [/INST]
 """
-    return llm(prompt).strip()
 
 
-async def generate_answer_async(llm, query: str, context: str) -> str:
-    """Run LLM generation in background thread to avoid blocking event loop."""
-    return await to_thread(generate_answer, llm, query, context) 
\ No newline at end of file
+# Static instruction block shared by every prompt (KV-cached by the llama.cpp runtime)
+PROMPT_PREFIX = PROMPT_TEMPLATE.split("{context}")[0]
+
+
+def build_prompt(query: str, context: str) -> str:
+    return PROMPT_TEMPLATE.format(context=context, query=query)
+
+
+# Stop strings for the chat format (the model must not start another turn)
+STOP_SEQUENCES = ["[INST]", "[/INST]", "</s>", "<|im_end|>", "<|im_start|>"]
+
+_SHORT_ANSWER_HINTS = re.compile(
+    r"\b(what is|what are|who|when|how much|how many|nedir|nelerdir|kimdir|ne zaman|ne kadar|kaç|"
+    r"qu'est-ce|quel|quelle|combien)\b",
+    re.IGNORECASE,
+)
+_LONG_ANSWER_HINTS = re.compile(
+    r"\b(explain|describe|compare|difference|list|steps|why|how (?:do|does|can|to|are|is)|"
+    r"açıkla|karşılaştır|fark|listele|adım|neden|nasıl|expliquez|comparez|pourquoi|comment)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class GenerationParams:
+    max_new_tokens: int
+    stop: List[str] = field(default_factory=lambda: list(STOP_SEQUENCES))
+
+
+def generation_params(query: str, context: str) -> GenerationParams:
+    """Per-request decoding settings.
+
+    The token cap depends on the kind of question (short factual lookups vs.
+    explain/compare/list requests) and is further limited by the context size:
+    an answer restricted to the context cannot usefully be much longer than it.
+    """
+    if _LONG_ANSWER_HINTS.search(query):
+        cap = settings.LLM_ANSWER_TOKENS_LONG
+    elif _SHORT_ANSWER_HINTS.search(query):
+        cap = settings.LLM_ANSWER_TOKENS_SHORT
+    else:
+        cap = settings.LLM_ANSWER_TOKENS_DEFAULT
+    cap = min(cap, 64 + count_tokens(context) // 2)  # 64: room for the citation line
+    window_left = LLM_CONTEXT_LENGTH - count_tokens(build_prompt(query, context))
+    # Never more than the window has left; 0 means the prompt already fills it
+    return GenerationParams(max_new_tokens=max(0, min(cap, window_left)))
+
+
+class Cancellation:
+    """Cancellation flag shared between the event loop and a decoding thread.
+
+    Set explicitly (client disconnected) or implicitly once *timeout* seconds
+    have passed since :meth:`start`; the token loop checks it before every
+    token. Generation starts the clock once a scheduler slot is acquired, so
+    queue time does not eat into the generation deadline.
+    """
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+        self.timeout = timeout
+        self.deadline: Optional[float] = None  # not running until start()
+
+    def start(self) -> None:
+        """Start the deadline clock from now."""
+        self.deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def cancel(self, reason: str) -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def check(self) -> Optional[str]:
+        """Reason if generation should stop now, else None."""
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self.reason
+
+
+_QUOTES = " \t\r\n\"'“”‘’«»*_`"
+
+
+def _normalize_answer(text: str) -> str:
+    """*text* without leading quotes / emphasis and with straight apostrophes."""
+    return text.replace("’", "'").replace("‘", "'").lstrip(_QUOTES)
+
+
+def generate_tokens(
+    llm, prompt: str, params: GenerationParams, cancel: Optional[Cancellation] = None
+) -> Iterator[str]:
+    """Decode with *params*, ending early once the answer is complete.
+
+    Besides the cap and stop strings handled by the runtime, decoding stops
+    after the line that starts with ``*Citation:``, right after the
+    no-information sentence (also when quoted), and as soon as *cancel* is set.
+    Leaving the loop closes the runtime's token iterator, which stops decoding.
+    Nothing is decoded when the context window leaves no room for an answer.
+    """
+    if cancel is not None and cancel.check():
+        metrics.inc(f"llm.stop_reason.cancelled_{cancel.reason}")
+        return
+    if params.max_new_tokens <= 0:
+        metrics.inc("llm.stop_reason.no_room")
+        return
+    text = ""
+    produced = 0  # tokens; a streamed piece can hold several (HTTP backends)
+    reason = "stop_or_length"  # runtime ended the stream itself
+    for piece in llm(prompt, stream=True, max_new_tokens=params.max_new_tokens, stop=params.stop):
+        if cancel is not None and cancel.check():
+            reason = f"cancelled_{cancel.reason}"
+            # Capacity handed back: tokens the request was still allowed to decode
+            metrics.inc("llm.cancelled_tokens_saved", max(0, params.max_new_tokens - produced))
+            break
+        produced += max(1, count_tokens(piece))
+        text += piece
+        cite_at = text.find("*Citation:")
+        if cite_at != -1 and "\n" in text[cite_at:]:
+            end = text.index("\n", cite_at)
+            keep = len(piece) - (len(text) - end)
+            if keep > 0:
+                yield piece[:keep]
+            reason = "citation"
+            break
+        if _normalize_answer(text).startswith(NO_INFO_ANSWER):
+            yield piece
+            reason = "no_info"
+            break
+        yield piece
+    metrics.inc(f"llm.stop_reason.{reason}")
+
+
+def generate_answer(llm, query: str, context: str, cancel: Optional[Cancellation] = None) -> str:
+    print(f"Generating answer for query: {query}")
+    return "".join(stream_answer(llm, query, context, cancel)).strip()
+
+
+def stream_answer(llm, query: str, context: str, cancel: Optional[Cancellation] = None) -> Iterator[str]:
+    """Yield generated text pieces as the model decodes them."""
+    print(f"Streaming answer for query: {query}")
+    params = generation_params(query, context)
+    metrics.observe("llm.max_new_tokens", params.max_new_tokens)
+    yield from generate_tokens(llm, build_prompt(query, context), params, cancel)
+
+
+async def generate_answer_in_slot(llm, query: str, context: str, cancel: Cancellation) -> str:
+    """Generate in a worker thread; the caller holds an LLM scheduler slot.
+
+    Starts the deadline on *cancel*. If the awaiting task is cancelled, decoding
+    is cancelled too and this waits for the thread to stop, so the slot is not
+    released while the model is still busy.
+    """
+    cancel.start()
+    task = asyncio.ensure_future(to_thread(generate_answer, llm, query, context, cancel))
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        cancel.cancel("cancelled")
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+
+
+async def generate_answer_async(llm, query: str, context: str, cancel: Optional[Cancellation] = None) -> str:
+    """Run LLM generation in background thread to avoid blocking event loop.
+
+    Waits for a slot on the LLM scheduler first; raises ``SchedulerOverloaded``
+    when the queue is full. The deadline on *cancel* starts once the slot is
+    acquired. If *cancel* fires, the partial text is returned and
+    ``cancel.reason`` tells why.
+    """
+    async with llm_scheduler.slot():
+        return await generate_answer_in_slot(llm, query, context, cancel or Cancellation())
+
+
+async def astream_answer(
+    llm, query: str, context: str, cancel: Optional[Cancellation] = None
+) -> AsyncIterator[str]:
+    """Async iterator over :func:`stream_answer` running in a worker thread.
+
+    Tokens are handed to the event loop as they are produced. Closing the
+    iterator early (e.g. client went away) cancels decoding at the next token;
+    a deadline on *cancel* ends the stream early with ``cancel.reason`` set.
+    The caller is responsible for holding an LLM scheduler slot; the deadline
+    on *cancel* starts here.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = cancel or Cancellation()
+    cancel.start()
+    done = object()
+
+    def worker() -> None:
+        try:
+            for piece in stream_answer(llm, query, context, cancel):
+                loop.call_soon_threadsafe(queue.put_nowait, piece)
+        except Exception as exc:  # surfaced to the consumer below
+            loop.call_soon_threadsafe(queue.put_nowait, exc)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    future = loop.run_in_executor(None, worker)
+    finished = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                finished = True
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if not finished:
+            cancel.cancel("disconnect")
+        await future
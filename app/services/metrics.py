@@ -0,0 +1,54 @@
+"""
+In-process metrics registry.
+Counters, simple timing summaries and pluggable providers, exposed as JSON on ``GET /metrics``.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict
+
+
+class Metrics:
+    """Thread-safe counters and summaries (count / sum / max) keyed by name."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+        self._providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            s = self._summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            s["count"] += 1
+            s["sum"] += value
+            s["max"] = max(s["max"], value)
+
+    def register(self, name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+        """Attach a callable whose dict is included under *name* in every snapshot."""
+        self._providers[name] = provider
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = {
+                "counters": dict(self._counters),
+                "summaries": {
+                    k: {**v, "avg": (v["sum"] / v["count"]) if v["count"] else 0.0}
+                    for k, v in self._summaries.items()
+                },
+            }
+        for name, provider in self._providers.items():
+            data[name] = provider()
+        return data
+
+
+metrics = Metrics()
@@ -1,24 +1,35 @@
 from __future__ import annotations
 
+import re
+import time
+import unicodedata
 from functools import lru_cache
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
 from asyncio import to_thread
 
+from app.config import settings
 from app.models import ACCESS_MATRIX, AccessType, DocumentChunk  # add DocumentChunk
+from app.services.access_policy import get_policy
+from app.services.cache_service import retrieval_cache
+from app.services.token_counter import count_tokens
 
 TOP_K_DEFAULT = 3
+EMBEDDING_MODEL = "intfloat/multilingual-e5-large"
 
 
 @lru_cache(maxsize=1)
 def load_embedder():
+    # Heavy imports (torch, sentence_transformers) stay out of module import time
     import torch  # local import
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    return SentenceTransformer("intfloat/multilingual-e5-large", device=device)
+    return SentenceTransformer(EMBEDDING_MODEL, device=device)
 
 
 def embed_text(text: str) -> np.ndarray:
@@ -31,12 +42,52 @@ async def embed_text_async(text: str) -> np.ndarray:
     return await to_thread(embed_text, text)
 
 
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed several texts in a single encoder batch (one row per text)."""
+    model = load_embedder()
+    return model.encode(texts)
+
+
+async def embed_texts_async(texts: List[str]) -> np.ndarray:
+    """Non-blocking batch embed call using default thread pool."""
+    return await to_thread(embed_texts, texts)
+
+
 def allowed_doc_types(level: int) -> List[str]:
-    return [dt for dt, mapping in ACCESS_MATRIX.items() if mapping.get(level, AccessType.NONE) != AccessType.NONE]
+    return get_policy().allowed_types(level)
+
+
+async def vector_search(
+    db: AsyncSession,
+    embed: np.ndarray,
+    allowed_types: List[str],
+    top_k: int = TOP_K_DEFAULT,
+    level: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return list of chunk dicts ordered by distance.
+
+    Retrieval runs in two phases: the ANN query only returns chunk metadata and
+    distances, then content is fetched by primary key. When *level* is given
+    Postgres picks the visible content per row via the access policy's CASE
+    expression (full text, summary or labels); rows hidden by the matrix get no
+    content at all. Without *level* every content column is hydrated.
+    """
+    print("[DEBUG] vector_search allowed_types:", allowed_types)
+    if settings.VECTOR_SEARCH_FAST_PATH:
+        from app.services.fast_search import fast_vector_search
+
+        # Same server as the hydrating session (replica or primary)
+        chunks = await fast_vector_search(embed, allowed_types, top_k, target=db.bind.url)
+    else:
+        chunks = await orm_vector_search(db, embed, allowed_types, top_k)
+    print(f"[DEBUG] vector_search fetched rows: {len(chunks)}")
+
+    await hydrate_chunks(db, chunks, level)
+    return chunks
 
 
-async def vector_search(db: AsyncSession, embed: np.ndarray, allowed_types: List[str], top_k: int = TOP_K_DEFAULT) -> List[Dict[str, Any]]:
-    """Return list of chunk dicts ordered by distance using ORM expressions."""
+async def orm_vector_search(db: AsyncSession, embed: np.ndarray, allowed_types: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """Phase one via a SQLAlchemy select: chunk metadata and distances only."""
     embed_list = embed.tolist()
 
     distance_expr = DocumentChunk.embedding.l2_distance(embed_list).label("distance")
@@ -50,9 +101,6 @@ async def vector_search(db: AsyncSession, embed: np.ndarray, allowed_types: List
             DocumentChunk.document_type,
             DocumentChunk.main_section_title,
             DocumentChunk.sub_section_title,
-            DocumentChunk.text_content,
-            DocumentChunk.summary,
-            DocumentChunk.generated_labels,
             distance_expr,
         )
         .where(DocumentChunk.document_type.in_(allowed_types))
@@ -60,10 +108,8 @@ async def vector_search(db: AsyncSession, embed: np.ndarray, allowed_types: List
         .limit(top_k)
     )
 
-    print("[DEBUG] vector_search allowed_types:", allowed_types)
     result = await db.execute(stmt)
     rows = result.fetchall()
-    print(f"[DEBUG] vector_search fetched rows: {len(rows)}")
 
     cols = [
         "chunk_id",
@@ -73,55 +119,341 @@ async def vector_search(db: AsyncSession, embed: np.ndarray, allowed_types: List
         "document_type",
         "main_section_title",
         "sub_section_title",
-        "text_content",
-        "summary",
-        "generated_labels",
         "distance",
     ]
     return [dict(zip(cols, row)) for row in rows]
 
 
-def choose_content(chunk: Dict[str, Any], level: int) -> str | None:
-    """Return appropriate content string for the user level based on ACCESS_MATRIX.
+def batch_search_statement(embeds: np.ndarray, allowed_types: List[str], top_k: int):
+    """The ``VALUES`` + ``LATERAL`` statement behind :func:`batch_vector_search`.
+
+    Each bound vector is cast explicitly: pgvector's bind type renders no cast,
+    and asyncpg would otherwise send the ``VALUES`` column as ``text``.
+    """
+    values = ", ".join(f"({i}, CAST(:q{i} AS vector))" for i in range(len(embeds)))
+    return text(
+        f"""
+        SELECT q.idx, c.chunk_id, c.source_document, c.entity, c.language, c.document_type,
+               c.main_section_title, c.sub_section_title, c.distance
+        FROM (VALUES {values}) AS q(idx, embedding)
+        CROSS JOIN LATERAL (
+            SELECT dc.chunk_id, dc.source_document, dc.entity, dc.language, dc.document_type,
+                   dc.main_section_title, dc.sub_section_title,
+                   dc.embedding <-> q.embedding AS distance
+            FROM document_chunks dc
+            WHERE dc.document_type = ANY(:allowed_types)
+            ORDER BY dc.embedding <-> q.embedding
+            LIMIT :top_k
+        ) AS c
+        ORDER BY q.idx, c.distance
+        """
+    ).bindparams(
+        *[bindparam(f"q{i}", embeds[i].tolist(), type_=DocumentChunk.embedding.type) for i in range(len(embeds))],
+        bindparam("allowed_types", list(allowed_types), type_=ARRAY(String)),
+        bindparam("top_k", top_k),
+    )
+
+
+async def batch_vector_search(
+    db: AsyncSession,
+    embeds: np.ndarray,
+    allowed_types: List[str],
+    top_k: int = TOP_K_DEFAULT,
+    level: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Top-k search for many query vectors in one statement.
+
+    The query vectors are sent as a ``VALUES`` list and each one drives a
+    ``LATERAL`` ANN subquery, so N queries cost one round-trip instead of N.
+    Returns one chunk list per input vector, in input order.
+    """
+    n = len(embeds)
+    if n == 0:
+        return []
+
+    stmt = batch_search_statement(embeds, allowed_types, top_k)
+    result = await db.execute(stmt)
+    per_query: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+    flat: List[Dict[str, Any]] = []
+    for row in result.mappings():
+        chunk = {k: v for k, v in row.items() if k != "idx"}
+        per_query[row["idx"]].append(chunk)
+        flat.append(chunk)
+    print(f"[DEBUG] batch_vector_search fetched rows: {len(flat)} for {n} queries")
+
+    await hydrate_chunks(db, flat, level)
+    return per_query
+
+
+async def hydrate_chunks(db: AsyncSession, chunks: List[Dict[str, Any]], level: Optional[int] = None) -> None:
+    """Load content for *chunks* in place (phase two of retrieval).
+
+    With a *level*, one primary-key lookup returns ``content``, ``access_type``
+    and ``fallback`` (summary of FULL chunks) already resolved by the compiled
+    policy, so only the columns that level may see are read. Without a level
+    all content columns are loaded.
+    """
+    if not chunks:
+        return
+    if level is None:
+        columns = (DocumentChunk.text_content, DocumentChunk.summary, DocumentChunk.generated_labels)
+    else:
+        policy = get_policy()
+        columns = (
+            policy.content_expr(level).label("content"),
+            policy.access_expr(level).label("access_type"),
+            policy.fallback_expr(level).label("fallback"),
+        )
+
+    # The same chunk may appear several times (batch retrieval)
+    by_id: Dict[Any, List[Dict[str, Any]]] = {}
+    for ch in chunks:
+        by_id.setdefault(ch["chunk_id"], []).append(ch)
+    stmt = select(DocumentChunk.chunk_id, *columns).where(DocumentChunk.chunk_id.in_(list(by_id)))
+    result = await db.execute(stmt)
+    for row in result.mappings():
+        for target in by_id[row["chunk_id"]]:
+            for key, value in row.items():
+                if key != "chunk_id":
+                    target[key] = value
+
+
+# ---------------------------------------------------------------------------
+# Cached retrieval
+# ---------------------------------------------------------------------------
+
+# (version, read_at) – corpus version is re-read at most every CORPUS_VERSION_TTL_SECONDS
+_corpus_version_state: Dict[str, Any] = {"version": None, "read_at": 0.0}
+
+
+def normalize_query(query: str) -> str:
+    """Cache-key form of a query: NFC + collapsed whitespace.
+
+    Case is preserved on purpose – the embedder is case-sensitive, so folding
+    case could serve results the uncached path would not return.
+    """
+    return " ".join(unicodedata.normalize("NFC", query).split())
 
-    Priority:
-    1. FULL      -> raw full text (text_content)
-    2. SUMMARY   -> summary field
-    3. RELEVANT  -> relevant snippet (if missing, fallback to summary)
-    4. NONE      -> None (filtered out later)
+
+# Corpus languages (document_chunks.language): distinctive letters and frequent function words
+_LANGUAGE_LETTERS = {"tr": set("ğışİĞŞ"), "fr": set("éèêëàâîïôûùœÉÈÀ")}
+_LANGUAGE_WORDS = {
+    "tr": {"ve", "bir", "bu", "için", "ile", "nedir", "nasıl", "ne", "mi", "mı", "mu", "mü", "hangi", "kaç", "var", "olan"},
+    "fr": {"le", "la", "les", "des", "du", "est", "et", "une", "un", "pour", "comment", "quel", "quelle", "quels", "vos", "sont"},
+    "en": {"the", "is", "are", "what", "how", "which", "of", "and", "for", "does", "do", "to", "a", "an", "my", "can"},
+}
+
+
+def detect_language(query: str) -> str:
+    """Best-effort language of *query* among the corpus languages (tr / fr / en).
+
+    A cheap heuristic, not a classifier: letters unique to Turkish or French
+    weigh most, then common function words; ties fall back to English.
+    """
+    words = re.findall(r"\w+", query.lower())
+    scores = {lang: sum(w in vocab for w in words) for lang, vocab in _LANGUAGE_WORDS.items()}
+    for lang, letters in _LANGUAGE_LETTERS.items():
+        scores[lang] += 2 * sum(ch in letters for ch in query)
+    best = max(scores, key=scores.get)
+    return best if scores[best] > scores["en"] else "en"
+
+
+async def get_corpus_version(db: AsyncSession) -> Optional[int]:
+    """Return the current ``corpus_version`` (bumped by ingestion), or None if unavailable.
+
+    When the table is missing (migration not applied) None is returned and the
+    retrieval cache is bypassed rather than risking stale results.
     """
-    vis = ACCESS_MATRIX.get(chunk["document_type"], {}).get(level, AccessType.NONE)
-    if vis == AccessType.NONE:
+    now = time.monotonic()
+    state = _corpus_version_state
+    if state["version"] is not None and now - state["read_at"] < settings.CORPUS_VERSION_TTL_SECONDS:
+        return state["version"]
+    try:
+        async with db.begin_nested():
+            result = await db.execute(text("SELECT version FROM corpus_version WHERE id = 1"))
+            version = result.scalar()
+    except Exception as exc:  # table missing / non-Postgres backend
+        print("[DEBUG] corpus_version unavailable, retrieval cache bypassed:", exc)
         return None
+    state["version"], state["read_at"] = version, now
+    return version
+
+
+def _copy_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(ch) for ch in chunks]
 
-    if vis == AccessType.SUMMARY:
+
+async def retrieve_chunks(
+    db: AsyncSession,
+    query: str,
+    level: int,
+    top_k: int = TOP_K_DEFAULT,
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Embed *query* and return ``(embedding, chunks)`` for *level*, served from cache when possible.
+
+    The cache key includes the access level, so results hydrated for one level
+    are never returned to another.
+    """
+    version = await get_corpus_version(db) if settings.RETRIEVAL_CACHE_ENABLED else None
+    key = (normalize_query(query), level, top_k, version)
+    if version is not None:
+        hit = retrieval_cache.get(key)
+        if hit is not None:
+            embed, chunks = hit
+            print("[DEBUG] retrieval cache hit")
+            return embed, _copy_chunks(chunks)
+
+    embed = await embed_text_async(query)
+    chunks = await vector_search(db, embed, allowed_doc_types(level), top_k=top_k, level=level)
+    if version is not None:
+        retrieval_cache.set(key, (embed, _copy_chunks(chunks)))
+    return embed, chunks
+
+
+async def retrieve_chunks_batch(
+    db: AsyncSession,
+    queries: List[str],
+    level: int,
+    top_k: int = TOP_K_DEFAULT,
+) -> List[List[Dict[str, Any]]]:
+    """Batch variant of :func:`retrieve_chunks`; only cache misses are embedded and searched."""
+    version = await get_corpus_version(db) if settings.RETRIEVAL_CACHE_ENABLED else None
+    keys = [(normalize_query(q), level, top_k, version) for q in queries]
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+    if version is not None:
+        for i, key in enumerate(keys):
+            hit = retrieval_cache.get(key)
+            if hit is not None:
+                results[i] = _copy_chunks(hit[1])
+
+    misses = [i for i, r in enumerate(results) if r is None]
+    if misses:
+        embeds = await embed_texts_async([queries[i] for i in misses])
+        found = await batch_vector_search(db, embeds, allowed_doc_types(level), top_k=top_k, level=level)
+        for j, i in enumerate(misses):
+            results[i] = found[j]
+            if version is not None:
+                retrieval_cache.set(keys[i], (embeds[j], _copy_chunks(found[j])))
+    print(f"[DEBUG] batch retrieval cache hits: {len(queries) - len(misses)}/{len(queries)}")
+    return results  # type: ignore[return-value]
+
+
+def choose_content(chunk: Dict[str, Any], level: int) -> str | None:
+    """Return appropriate content string for the user level based on the access policy.
+
+    Chunks hydrated for a level already carry the SQL-resolved ``content``;
+    otherwise the policy resolves it from the raw columns (see
+    :meth:`AccessPolicy.resolve_content`).
+    """
+    if "content" in chunk:
+        return chunk["content"]
+    return get_policy().resolve_content(chunk, level)
+
+
+def chunk_access(chunk: Dict[str, Any], level: int) -> str:
+    """Access type of *chunk* for *level* (SQL-resolved when available)."""
+    return chunk.get("access_type") or get_policy().access(chunk["document_type"], level)
+
+
+def relevance_threshold(language: Optional[str]) -> Optional[float]:
+    """Max best-chunk distance for *language* with the current embedding model (None = no limit)."""
+    table = settings.RELEVANCE_MAX_DISTANCE.get(EMBEDDING_MODEL) or {}
+    return table.get(language or "", table.get("default"))
+
+
+def nothing_relevant(chunks: List[Dict[str, Any]], language: Optional[str]) -> bool:
+    """True when even the nearest chunk is farther than the threshold calibrated
+    for the query's *language* (see :func:`detect_language`)."""
+    if not chunks or chunks[0].get("distance") is None:
+        return False
+    threshold = relevance_threshold(language)
+    return threshold is not None and chunks[0]["distance"] > threshold
+
+
+def chunk_citation(chunk: Dict[str, Any]) -> str:
+    citation = f"{chunk['entity']} – {chunk['main_section_title']}"
+    if chunk.get("sub_section_title"):
+        citation += f", {chunk['sub_section_title']}"
+    return citation
+
+
+def chunk_fallback(chunk: Dict[str, Any], level: int) -> str | None:
+    """Shorter stand-in for a FULL chunk's text (its summary), if *level* sees it in full."""
+    if "fallback" in chunk:
+        return chunk["fallback"]
+    if chunk_access(chunk, level) == AccessType.FULL:
         return chunk.get("summary")
+    return None
+
 
-    if vis == AccessType.RELEVANT:
-        # Use generated_labels first; else summary; else first 400 chars
-        labels = chunk.get("generated_labels")
-        if labels:
-            # Ensure string format (comma-separated)
-            return ", ".join(labels)
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
 
-        # Fallbacks
-        if chunk.get("summary"):
-            return chunk["summary"]
-        raw = chunk.get("text_content") or ""
-        return raw[:400] + ("…" if len(raw) > 400 else "")
 
-    # AccessType.FULL – return full raw text
-    return chunk.get("text_content")
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest run of whole sentences from the start of *text* within *max_tokens*.
+
+    Falls back to a word-level cut (with "…") when not even the first sentence fits.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = count_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+    # Longest word prefix that fits: binary search, O(log n) tokenizer calls
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + "…") <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + "…" if lo else ""
 
 
-def build_context(chunks: List[Dict[str, Any]], level: int) -> str:
-    parts = []
-    for idx, ch in enumerate(chunks, 1):
+def assemble_context(
+    chunks: List[Dict[str, Any]], level: int, token_budget: Optional[int] = None
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Context block for the prompt plus the chunks it cites, in label order.
+
+    Labels ``[[1]]..[[n]]`` are contiguous over the chunks actually included.
+    With a *token_budget* (counted with the model tokenizer) the top-ranked
+    chunk is kept in full when it fits; lower-ranked chunks fall back to their
+    summary when the full text does not fit, and anything still too long is cut
+    at a sentence boundary. Chunks that no longer fit are dropped.
+    """
+    parts: List[str] = []
+    used_chunks: List[Dict[str, Any]] = []
+    used = 0
+    for ch in chunks:
         content = choose_content(ch, level)
         if not content:
             continue
-        citation = f"{ch['entity']} – {ch['main_section_title']}"
-        if ch.get("sub_section_title"):
-            citation += f", {ch['sub_section_title']}"
-        parts.append(f"[[{idx}]] {content}\n*Citation: {citation}*")
-    return "\n\n".join(parts) 
\ No newline at end of file
+        label = len(parts) + 1
+        head, tail = f"[[{label}]] ", f"\n*Citation: {chunk_citation(ch)}*"
+        if token_budget is not None:
+            remaining = token_budget - used - count_tokens(head + tail) - (2 if parts else 0)
+            if remaining <= 0:
+                break
+            if count_tokens(content) > remaining:
+                fallback = chunk_fallback(ch, level)
+                if parts and fallback:
+                    content = fallback
+                content = truncate_to_tokens(content, remaining)
+                if not content:
+                    break
+            used += count_tokens(head + content + tail) + (2 if parts else 0)
+        parts.append(f"{head}{content}{tail}")
+        used_chunks.append(ch)
+    return "\n\n".join(parts), used_chunks
+
+
+def build_context(chunks: List[Dict[str, Any]], level: int, token_budget: Optional[int] = None) -> str:
+    return assemble_context(chunks, level, token_budget)[0]
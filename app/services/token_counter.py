@@ -0,0 +1,99 @@
+"""
+Token counting for prompt budgeting.
+
+Context budgets are measured with the model's own tokenizer, picked in order:
+
+1. ``LLM_TOKENIZER`` (a Hugging Face name or local path) – only the tokenizer
+   files are loaded, not the model;
+2. with the local llama.cpp runtime, the vocabulary of the GGUF at
+   ``YI_MODEL_PATH`` (``vocab_only``: no weights, so this also works when the
+   model runs in worker processes);
+3. the in-process model itself, registered by ``load_llm`` via
+   :func:`use_model_tokenizer` (ctransformers).
+
+Without any of them (e.g. ``LLM_BACKEND=http`` and no ``LLM_TOKENIZER``),
+counts fall back to a conservative characters-per-token estimate.
+
+Loading may import transformers / llama.cpp and read the model file, so the
+API warms it at startup in a worker thread (:func:`warm_tokenizer`) rather
+than on the first request's event-loop turn. For case 3 that loads the model.
+"""
+
+from __future__ import annotations
+
+import math
+from asyncio import to_thread
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from app.config import settings
+
+# Yi on mixed Turkish/English banking text averages ~3.5 chars per token; 3 errs on the safe side
+CHARS_PER_TOKEN_ESTIMATE = 3.0
+
+_model_tokenize: Optional[Callable[[str], List[int]]] = None
+
+
+def _hf_tokenizer() -> Optional[Callable[[str], List[int]]]:
+    try:
+        from transformers import AutoTokenizer  # type: ignore
+
+        tokenizer = AutoTokenizer.from_pretrained(settings.LLM_TOKENIZER)
+    except Exception as exc:
+        print(f"[DEBUG] Tokenizer '{settings.LLM_TOKENIZER}' unavailable:", exc)
+        return None
+    return lambda text: tokenizer.encode(text, add_special_tokens=False)
+
+
+def _gguf_tokenizer() -> Optional[Callable[[str], List[int]]]:
+    from .llm_service import yi_model_path
+
+    try:
+        from llama_cpp import Llama  # type: ignore
+
+        vocab = Llama(model_path=yi_model_path(), vocab_only=True, verbose=False)
+    except Exception as exc:
+        print("[DEBUG] GGUF vocabulary unavailable:", exc)
+        return None
+    return lambda text: vocab.tokenize(text.encode("utf-8"), add_bos=False)
+
+
+@lru_cache(maxsize=1)
+def load_tokenizer() -> Optional[Callable[[str], List[int]]]:
+    """``text -> token ids`` of the configured tokenizer or GGUF vocabulary, or None."""
+    if settings.LLM_TOKENIZER:
+        return _hf_tokenizer()
+    if settings.LLM_BACKEND != "http" and settings.LLM_RUNTIME == "llama_cpp":
+        return _gguf_tokenizer()
+    return None
+
+
+def use_model_tokenizer(tokenize: Optional[Callable[[str], List[int]]]) -> None:
+    """Count with the loaded in-process model when no tokenizer is configured."""
+    global _model_tokenize
+    _model_tokenize = tokenize
+
+
+async def warm_tokenizer() -> None:
+    """Load the tokenizer off the event loop.
+
+    When only the in-process model can provide one, the model is loaded now
+    (the first answer would load it anyway), so even the first budgets are exact.
+    """
+    if await to_thread(load_tokenizer) is not None:
+        return
+    if settings.LLM_BACKEND != "http" and settings.LLM_REPLICAS == 0:
+        from .llm_service import load_llm
+
+        await to_thread(load_llm)
+    if _model_tokenize is None:
+        print("[DEBUG] No model tokenizer available; estimating tokens from length")
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenize = load_tokenizer() or _model_tokenize
+    if tokenize is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE)
+    return len(tokenize(text))
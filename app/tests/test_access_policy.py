@@ -0,0 +1,40 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models import ACCESS_MATRIX, AccessType
+from app.services.access_policy import AccessPolicy, policy_from_rows
+
+
+def test_policy_matches_matrix():
+    policy = AccessPolicy(ACCESS_MATRIX)
+    assert policy.allowed_types(1) == ["Public Product Info"]
+    assert "Investigation Reports" not in policy.allowed_types(4)
+    assert policy.access("Regulatory Docs", 3) == AccessType.RELEVANT
+    assert policy.access("Unknown", 5) == AccessType.NONE
+
+
+def test_resolve_content_per_visibility():
+    policy = AccessPolicy(ACCESS_MATRIX)
+    chunk = {
+        "document_type": "Regulatory Docs",
+        "text_content": "x" * 500,
+        "summary": "short summary",
+        "generated_labels": [],
+    }
+    assert policy.resolve_content(chunk, 1) is None
+    assert policy.resolve_content(chunk, 2) == "short summary"
+    assert policy.resolve_content(chunk, 3) == "short summary"  # no labels -> summary
+    assert policy.resolve_content({**chunk, "summary": None}, 3) == "x" * 400 + "…"
+    assert policy.resolve_content(chunk, 5) == "x" * 500
+
+
+def test_content_expr_compiles_to_case():
+    policy = AccessPolicy(ACCESS_MATRIX)
+    sql = str(policy.content_expr(4).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("CASE WHEN")
+    assert "text_content" in sql and "summary" in sql
+
+
+def test_policy_from_view_rows_uses_chunk_type_names():
+    policy = policy_from_rows([("regulatory_docs", 2, "summary"), ("public_product_info", 2, "full")])
+    assert policy.allowed_types(2) == ["Regulatory Docs", "Public Product Info"]
+    assert policy.version != AccessPolicy(ACCESS_MATRIX).version
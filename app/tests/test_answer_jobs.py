@@ -0,0 +1,98 @@
+import asyncio
+import time
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import answer_jobs
+from app.services.answer_jobs import DONE, FAILED, JobStore
+from app.services.answer_service import AnswerPlan
+from app.services.llm_scheduler import LLMScheduler, SchedulerOverloaded
+
+
+def test_finished_jobs_expire_after_ttl():
+    store = JobStore(ttl=0, max_jobs=10)
+    job = store.create(uuid4(), uuid4(), "q")
+    assert store.get(job.id, job.user_id) is job  # unfinished jobs never expire
+    store.finish(job, DONE)
+    assert store.get(job.id, job.user_id) is None
+    assert job.finished_at.tzinfo is not None
+
+
+def test_jobs_are_visible_to_their_owner_only():
+    store = JobStore(ttl=60, max_jobs=10)
+    job = store.create(uuid4(), uuid4(), "q")
+    assert store.get(job.id, uuid4()) is None
+    assert store.get(job.id, job.user_id) is job
+
+
+def test_store_rejects_jobs_beyond_max_jobs():
+    store = JobStore(ttl=60, max_jobs=1)
+    store.create(uuid4(), uuid4(), "q1")
+    with pytest.raises(OverflowError):
+        store.create(uuid4(), uuid4(), "q2")
+
+
+@pytest.mark.anyio
+async def test_run_job_fails_when_scheduler_overloaded(monkeypatch):
+    class OverloadedScheduler:
+        async def acquire(self, timeout=None):
+            raise SchedulerOverloaded("LLM queue is full", retry_after=5)
+
+    monkeypatch.setattr(answer_jobs, "llm_scheduler", OverloadedScheduler())
+    monkeypatch.setattr(answer_jobs, "job_store", JobStore(ttl=60, max_jobs=10))
+    job = answer_jobs.job_store.create(uuid4(), uuid4(), "q")
+    plan = AnswerPlan(query="q", access_level=1, embed=np.zeros(4), chunks=[], context="ctx")
+
+    await answer_jobs.run_job(job, plan, ip_address=None)
+    assert job.status == FAILED
+    assert job.error == "LLM queue is full"
+    assert job.answer is None
+
+
+def _slow_llm(decoded):
+    def llm(prompt, stream=False, **options):
+        for i in range(100):
+            time.sleep(0.01)
+            decoded.append(i)
+            yield " token"
+
+    return llm
+
+
+@pytest.mark.anyio
+async def test_run_job_fails_after_generation_deadline(monkeypatch):
+    monkeypatch.setattr(answer_jobs, "llm_scheduler", LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5, name="test_llm"))
+    monkeypatch.setattr(answer_jobs, "job_store", JobStore(ttl=60, max_jobs=10))
+    monkeypatch.setattr(answer_jobs, "load_llm", lambda: _slow_llm([]))
+    monkeypatch.setattr(settings, "LLM_REQUEST_DEADLINE_SECONDS", 0.05)
+    job = answer_jobs.job_store.create(uuid4(), uuid4(), "q")
+    plan = AnswerPlan(query="q", access_level=1, embed=np.zeros(4), chunks=[], context="ctx")
+
+    await answer_jobs.run_job(job, plan, ip_address=None)
+    assert job.status == FAILED
+    assert job.error == "Answer generation timed out."
+
+
+@pytest.mark.anyio
+async def test_cancelled_job_stops_decoding(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5, name="test_llm")
+    decoded = []
+    monkeypatch.setattr(answer_jobs, "llm_scheduler", scheduler)
+    monkeypatch.setattr(answer_jobs, "job_store", JobStore(ttl=60, max_jobs=10))
+    monkeypatch.setattr(answer_jobs, "load_llm", lambda: _slow_llm(decoded))
+    job = answer_jobs.job_store.create(uuid4(), uuid4(), "q")
+    plan = AnswerPlan(query="q", access_level=1, embed=np.zeros(4), chunks=[], context="ctx")
+
+    task = asyncio.create_task(answer_jobs.run_job(job, plan, ip_address=None))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert scheduler.active == 0
+    stopped_at = len(decoded)
+    time.sleep(0.05)
+    assert len(decoded) == stopped_at < 100
+    assert job.status == FAILED
@@ -0,0 +1,41 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.routers import rag as rag_router
+from app.services.answer_service import AnswerPlan
+
+
+@pytest.mark.anyio
+async def test_stream_closed_after_meta_releases_slot():
+    released = []
+    plan = AnswerPlan(query="q", access_level=1, embed=np.zeros(4), chunks=[], context="ctx")
+    assert plan.needs_llm
+
+    events = rag_router._answer_events("q", plan, uuid4(), uuid4(), None, lambda: released.append(True))
+    first = await events.__anext__()
+    assert first.startswith("event: meta")
+    await events.aclose()  # client disconnected before generation started
+    assert released
+
+
+@pytest.mark.anyio
+async def test_stream_closed_mid_generation_closes_token_stream(monkeypatch):
+    closed = []
+
+    async def fake_stream(llm, query, context, cancel):
+        try:
+            yield "Basel"
+            yield " III"
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(rag_router, "astream_answer", fake_stream)
+    monkeypatch.setattr(rag_router, "load_llm", lambda: None)
+    plan = AnswerPlan(query="q", access_level=1, embed=np.zeros(4), chunks=[], context="ctx")
+    events = rag_router._answer_events("q", plan, uuid4(), uuid4(), None, lambda: None)
+    await events.__anext__()  # meta
+    assert (await events.__anext__()).startswith("event: token")
+    await events.aclose()  # client went away after the first token
+    assert closed == [True]
@@ -0,0 +1,63 @@
+import re
+
+from app.services import rag_service as rag
+from app.services import token_counter
+
+
+def _chunk(cid, text, summary, doc_type="Public Product Info"):
+    return {
+        "chunk_id": cid,
+        "document_type": doc_type,
+        "entity": "Bank",
+        "main_section_title": f"Section {cid}",
+        "sub_section_title": None,
+        "text_content": text,
+        "summary": summary,
+        "generated_labels": [],
+    }
+
+
+def test_budget_keeps_top_chunk_and_summarises_the_rest(monkeypatch):
+    monkeypatch.setattr(rag, "count_tokens", lambda text: len(text.split()))
+    chunks = [
+        _chunk(1, "First sentence here. Second sentence here.", "top summary"),
+        _chunk(2, " ".join(["long"] * 50) + ".", "short summary two"),
+        _chunk(3, "Hidden text.", "hidden", doc_type="Investigation Reports"),
+        _chunk(4, " ".join(["tail"] * 50) + ".", None),
+    ]
+    context, used = rag.assemble_context(chunks, level=1, token_budget=30)
+
+    assert "[[1]] First sentence here. Second sentence here." in context
+    assert "[[2]] short summary two" in context  # full text did not fit
+    assert [c["chunk_id"] for c in used][:2] == [1, 2]
+    labels = re.findall(r"\[\[(\d+)\]\]", context)
+    assert labels == [str(i) for i in range(1, len(used) + 1)]  # hidden chunk leaves no gap
+    assert sum(len(p.split()) for p in context.split("\n\n")) <= 30
+
+
+def test_truncate_to_tokens_cuts_at_sentence_boundary(monkeypatch):
+    monkeypatch.setattr(rag, "count_tokens", lambda text: len(text.split()))
+    text = "One two three. Four five six. Seven eight nine."
+    assert rag.truncate_to_tokens(text, 8) == "One two three. Four five six."
+    assert rag.truncate_to_tokens(text, 100) == text
+
+
+def test_truncate_to_tokens_word_cut_uses_few_counts(monkeypatch):
+    calls = []
+
+    def count(text):
+        calls.append(text)
+        return len(text.split())
+
+    monkeypatch.setattr(rag, "count_tokens", count)
+    text = " ".join(f"w{i}" for i in range(1000))  # one very long "sentence"
+    assert rag.truncate_to_tokens(text, 10) == " ".join(f"w{i}" for i in range(10)) + "…"
+    assert len(calls) < 20
+
+
+def test_count_tokens_uses_the_loaded_model(monkeypatch):
+    monkeypatch.setattr(token_counter, "load_tokenizer", lambda: None)
+    monkeypatch.setattr(token_counter, "_model_tokenize", None)
+    estimate = token_counter.count_tokens("Basel III nedir?")
+    token_counter.use_model_tokenizer(lambda text: text.split())
+    assert token_counter.count_tokens("Basel III nedir?") == 3 != estimate
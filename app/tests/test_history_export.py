@@ -0,0 +1,46 @@
+from uuid import uuid4
+
+import pytest
+
+from app.services import history_service as history_srv
+
+
+class FakeStreamResult:
+    def __init__(self, rows, size):
+        self.rows, self.size = rows, size
+
+    def mappings(self):
+        return self
+
+    async def partitions(self):
+        for start in range(0, len(self.rows), self.size):
+            yield self.rows[start:start + self.size]
+
+
+class FakeSession:
+    def __init__(self, rows, statements):
+        self.rows, self.statements = rows, statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, stmt):
+        self.statements.append(stmt)
+        return FakeStreamResult(self.rows, stmt.get_execution_options()["yield_per"])
+
+
+@pytest.mark.anyio
+async def test_export_streams_in_fetch_size_batches():
+    rows = [{"query_text": f"q{i}", "response_text": "[]"} for i in range(5)]
+    statements = []
+    batches = [
+        batch
+        async for batch in history_srv.stream_history(
+            lambda: FakeSession(rows, statements), user_id=uuid4(), fetch_size=2
+        )
+    ]
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert len(statements) == 1 and statements[0].get_execution_options()["yield_per"] == 2
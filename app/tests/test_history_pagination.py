@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import history_service as history_srv
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    entry_id = uuid4()
+    cursor = history_srv.encode_cursor(created_at, entry_id)
+    assert history_srv.decode_cursor(cursor) == (created_at, entry_id)
+
+
+def test_invalid_cursor_rejected():
+    with pytest.raises(ValueError):
+        history_srv.decode_cursor("not-a-cursor")
+
+
+class FakeResult:
+    def mappings(self):
+        return self
+
+    def all(self):
+        return []
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return FakeResult()
+
+
+@pytest.mark.anyio
+async def test_session_summaries_is_one_distinct_on_query():
+    db = FakeSession()
+    cursor = history_srv.encode_cursor(datetime.now(timezone.utc), uuid4())
+    rows, next_cursor = await history_srv.list_session_summaries(db, user_id=uuid4(), limit=20, cursor=cursor)
+    assert rows == [] and next_cursor is None
+    assert len(db.statements) == 1
+    assert "DISTINCT ON (query_history.session_id)" in db.statements[0]
+    assert "LIMIT" in db.statements[0]
+
+
+@pytest.mark.anyio
+async def test_session_messages_page_without_response_text():
+    db = FakeSession()
+    cursor = history_srv.encode_cursor(datetime.now(timezone.utc), uuid4())
+    rows, next_cursor = await history_srv.session_messages(
+        db, user_id=uuid4(), session_id=uuid4(), limit=20, cursor=cursor, response_mode="none"
+    )
+    assert rows == [] and next_cursor is None
+    sql = db.statements[0]
+    assert "query_history.response_text" not in sql
+    assert "(query_history.created_at, query_history.id) <" in sql
+    assert "LIMIT" in sql
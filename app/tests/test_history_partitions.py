@@ -0,0 +1,75 @@
+from datetime import date
+
+import pytest
+
+from app.services import history_partitions as hp
+
+
+def test_partition_naming_round_trip():
+    assert hp.partition_name(date(2025, 3, 1)) == "query_history_y2025m03"
+    assert hp.partition_month("query_history_y2025m03") == date(2025, 3, 1)
+    assert hp.partition_month("query_history_legacy") is None
+
+
+def test_add_months_crosses_years():
+    assert hp.add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert hp.add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_partitions_to_expire_keeps_recent_months():
+    names = [hp.partition_name(date(2025, m, 1)) for m in range(1, 13)] + ["query_history_legacy"]
+    expired = hp.partitions_to_expire(names, keep_months=3, today=date(2025, 12, 15))
+    assert expired == [hp.partition_name(date(2025, m, 1)) for m in range(1, 10)]
+
+
+def test_default_partition_is_never_expired():
+    assert hp.partitions_to_expire([hp.DEFAULT_PARTITION], keep_months=1, today=date(2025, 12, 15)) == []
+
+
+class FakeResult:
+    def __init__(self, value=None, rows=()):
+        self.value = value
+        self.rows = rows
+
+    def scalar(self):
+        return self.value
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConn:
+    def __init__(self, partitions, default_rows):
+        self.partitions = partitions
+        self.default_rows = default_rows
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.statements.append(sql)
+        if "pg_partitioned_table" in sql:
+            return FakeResult(True)
+        if "pg_inherits" in sql:
+            return FakeResult(rows=[(name,) for name in self.partitions])
+        if sql.startswith("SELECT count(*)"):
+            return FakeResult(self.default_rows.get(sql.split("created_at >= '")[1][:10], 0))
+        return FakeResult()
+
+
+@pytest.mark.anyio
+async def test_ensure_partitions_moves_rows_out_of_default():
+    conn = FakeConn([hp.DEFAULT_PARTITION, "query_history_y2025m12"], {"2026-01-01": 4})
+    created = await hp.ensure_partitions(conn, months_ahead=1, today=date(2025, 12, 15))
+    assert created == ["query_history_y2026m01"]
+    moves = [s for s in conn.statements if "query_history_y2026m01" in s]
+    assert moves[0].startswith('CREATE TABLE "query_history_y2026m01" (LIKE')
+    assert moves[-1].startswith('ALTER TABLE query_history ATTACH PARTITION "query_history_y2026m01"')
+    assert any(s.startswith("DELETE FROM query_history_default") for s in conn.statements)
+
+
+@pytest.mark.anyio
+async def test_ensure_partitions_creates_missing_default():
+    conn = FakeConn([], {})
+    await hp.ensure_partitions(conn, months_ahead=0, today=date(2025, 12, 15))
+    assert any("PARTITION OF query_history DEFAULT" in s for s in conn.statements)
+    assert any('PARTITION OF query_history FOR VALUES' in s for s in conn.statements)
@@ -0,0 +1,66 @@
+import json
+from uuid import uuid4
+
+import pytest
+
+from app.services import history_service as history_srv
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, stmt):
+        return FakeResult(self.rows)
+
+
+@pytest.mark.anyio
+async def test_answer_payload_rebuilds_legacy_shape():
+    row = {"query_text": "Kredi kartı aidatı?", "response_payload": history_srv.answer_payload("350 TL")}
+    await history_srv.expand_responses(FakeSession([]), [row])
+    assert json.loads(row["response_text"]) == [{"query": "Kredi kartı aidatı?", "answer": "350 TL"}]
+    assert "response_payload" not in row
+
+
+@pytest.mark.anyio
+async def test_retrieve_payload_rebuilds_chunks_and_flags_changes():
+    kept, edited = uuid4(), uuid4()
+    chunk = {"document_type": "Public Product Info", "entity": "Ürün Bilgileri", "main_section_title": "Kartlar", "sub_section_title": None}
+    rows = [
+        {**chunk, "chunk_id": kept, "text_content": "Aidat 350 TL.", "summary": None, "generated_labels": None},
+        {**chunk, "chunk_id": edited, "text_content": "Aidat 400 TL.", "summary": None, "generated_labels": None},
+    ]
+    returned = [
+        {"chunk_id": str(cid), "document_type": "Public Product Info", "citation": "Ürün Bilgileri – Kartlar", "content": "Aidat 350 TL.", "distance": 0.2}
+        for cid in (kept, edited)
+    ]
+    payload = {"v": 1, "chunks": [{"id": c["chunk_id"], "access": "full", "distance": 0.2, "hash": history_srv.content_hash(c["content"])} for c in returned]}
+
+    row = {"query_text": "aidat", "response_payload": payload}
+    await history_srv.expand_responses(FakeSession(rows), [row])
+    rebuilt = json.loads(row["response_text"])
+    assert rebuilt[0] == returned[0]
+    assert rebuilt[1]["content"] is None and rebuilt[1]["content_changed"] is True
+
+
+@pytest.mark.anyio
+async def test_truncated_preview_does_not_load_chunks():
+    class NoQuerySession:
+        async def execute(self, stmt):
+            raise AssertionError("chunks must not be loaded for previews")
+
+    payload = {"v": 1, "chunks": [{"id": str(uuid4()), "access": "summary", "distance": 0.3, "hash": "x"}]}
+    row = {"query_text": "aidat", "response_payload": payload}
+    await history_srv.expand_responses(NoQuerySession(), [row], hydrate=False)
+    assert json.loads(row["response_text"])[0]["access"] == "summary"
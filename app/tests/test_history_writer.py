@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.services.history_writer import HistoryWriter
+
+
+class FakeSession:
+    def __init__(self, batches):
+        self.batches = batches
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, rows):
+        self.batches.append(list(rows))
+
+    async def commit(self):
+        pass
+
+
+def _writer(batches, **kwargs):
+    options = dict(batch_size=3, flush_interval=10.0, max_queue=100)
+    options.update(kwargs)
+    return HistoryWriter(session_factory=lambda: FakeSession(batches), **options)
+
+
+@pytest.mark.anyio
+async def test_rows_are_written_in_batches():
+    batches = []
+    writer = _writer(batches)
+    await writer.submit([{"query_text": f"q{i}"} for i in range(7)])
+    await asyncio.sleep(0.01)
+    assert [len(b) for b in batches] == [3, 3]  # the 7th row waits for the interval
+    await writer.close()
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert writer.stats()["written"] == 7
+
+
+@pytest.mark.anyio
+async def test_ack_waits_for_commit():
+    batches = []
+    writer = _writer(batches, flush_interval=0.01)
+    await writer.submit([{"query_text": "q"}], wait=True)
+    assert batches == [[{"query_text": "q"}]]
+    await writer.close()
+
+
+class FlakySession(FakeSession):
+    def __init__(self, batches, failures):
+        super().__init__(batches)
+        self.failures = failures
+
+    async def execute(self, stmt, rows):
+        if self.failures:
+            self.failures.pop()
+            raise ConnectionError("connection reset")
+        await super().execute(stmt, rows)
+
+
+@pytest.mark.anyio
+async def test_failed_batch_is_retried_then_dropped():
+    batches, failures = [], [1]
+    writer = HistoryWriter(
+        session_factory=lambda: FlakySession(batches, failures),
+        batch_size=2, flush_interval=10.0, max_queue=100, retries=1, retry_delay=0,
+    )
+    await writer._write([({"query_text": "q1"}, None), ({"query_text": "q2"}, None)])
+    assert batches == [[{"query_text": "q1"}, {"query_text": "q2"}]]  # second attempt succeeded
+    assert writer.stats()["retried_batches"] == 1 and writer.stats()["failed"] == 0
+
+    failures.extend([1, 1])
+    await writer._write([({"query_text": "q3"}, None)])
+    assert writer.stats()["failed"] == 1  # both attempts failed: counted as dropped
@@ -0,0 +1,54 @@
+import sys
+import types
+
+from app.services.llama_cpp_runtime import LlamaCppModel
+from app.services.metrics import metrics
+
+
+class FakeLlama:
+    """Word-level stand-in keeping llama-cpp-python's KV bookkeeping (input_ids / n_tokens)."""
+
+    def __init__(self, **options):
+        self.input_ids = []
+        self.evaluated = []
+
+    @property
+    def n_tokens(self):
+        return len(self.input_ids)
+
+    def tokenize(self, text, add_bos=True):
+        return ([0] if add_bos else []) + [hash(w) % 1000 + 1 for w in text.decode("utf-8").split()]
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens):
+        self.evaluated.append(len(tokens))
+        self.input_ids += list(tokens)
+
+    def create_completion(self, prompt, **options):
+        tokens = self.tokenize(prompt.encode("utf-8"))
+        common = 0
+        for a, b in zip(self.input_ids, tokens):
+            if a != b:
+                break
+            common += 1
+        self.input_ids = self.input_ids[:common]
+        self.eval(tokens[common:])  # built-in longest-prefix reuse
+        return {"choices": [{"text": "ok"}]}
+
+
+def test_prefix_is_evaluated_once_and_reused_by_llama_cpp(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=FakeLlama))
+    prefix = "[INST] You are BankBot , answer only from the context below"
+    model = LlamaCppModel("model.gguf", threads=1, prefix=prefix)
+    assert model.llm.evaluated == [len(model.prefix_tokens)]
+    hits = metrics.counter("llm.prefix_cache.hits")
+
+    prompts = [prefix + " [[1]] Rate is 5% . Question one", prefix + " [[1]] Fee is 350 TL . Question two"]
+    for prompt in prompts:
+        assert model(prompt) == "ok"
+    full = [len(model.llm.tokenize(p.encode("utf-8"))) for p in prompts]
+    # Each request only evaluated what follows the instruction block
+    assert all(n <= f - len(model.prefix_tokens) for n, f in zip(model.llm.evaluated[1:], full))
+    assert metrics.counter("llm.prefix_cache.hits") == hits + 2
@@ -0,0 +1,53 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from app.services.llm_backends import HTTPBackend, LLMBackend
+
+
+def _backend(handler):
+    backend = HTTPBackend("http://llm.local/v1", model="yi", timeout=5, max_connections=2)
+    backend._client = httpx.Client(base_url="http://llm.local/v1", transport=httpx.MockTransport(handler))
+    return backend
+
+
+def test_http_backend_streams_completion_pieces():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.update(json.loads(request.content))
+        events = [{"choices": [{"text": "Basel"}]}, {"choices": [{"text": " III"}]}]
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    backend = _backend(handler)
+    assert list(backend("prompt", stream=True, max_new_tokens=32, stop=["[INST]"])) == ["Basel", " III"]
+    assert seen["max_tokens"] == 32 and seen["stop"] == ["[INST]"] and seen["stream"] is True
+
+
+def test_http_backend_plain_completion():
+    backend = _backend(lambda request: httpx.Response(200, json={"choices": [{"text": "ok"}]}))
+    assert backend("prompt") == "ok"
+    assert backend.stats()["requests"] == 1
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+
+def test_http_backend_counts_concurrent_requests():
+    backend = _backend(lambda request: httpx.Response(500 if b"fail" in request.content else 200, json={"choices": [{"text": "ok"}]}))
+
+    def call(i):
+        try:
+            backend("fail" if i % 4 == 0 else "prompt")
+        except httpx.HTTPStatusError:
+            pass
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(call, range(200)))
+    assert backend.stats()["requests"] == 200
+    assert backend.stats()["errors"] == 50
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import llm_service as llm_srv
+from app.services.llm_scheduler import LLMScheduler
+
+
+def _fake_llm(pieces):
+    calls = {}
+
+    def llm(prompt, stream=False, **options):
+        calls.update(options)
+        return iter(pieces)
+
+    return llm, calls
+
+
+def test_generation_stops_after_citation_line():
+    llm, calls = _fake_llm(["Rate is 5% [1].", "\n*Citation: Bank – Rates*", "\nExtra", " rambling"])
+    params = llm_srv.GenerationParams(max_new_tokens=64)
+    out = "".join(llm_srv.generate_tokens(llm, "prompt", params))
+    assert out == "Rate is 5% [1].\n*Citation: Bank – Rates*"
+    assert calls["max_new_tokens"] == 64 and "[INST]" in calls["stop"]
+
+
+def test_generation_stops_on_no_info_sentence():
+    llm, _ = _fake_llm([" I don't have enough information", " in my current knowledge base to answer that.", " But"])
+    out = "".join(llm_srv.generate_tokens(llm, "prompt", llm_srv.GenerationParams(max_new_tokens=64)))
+    assert out.strip() == llm_srv.NO_INFO_ANSWER
+    assert llm_srv.NO_INFO_ANSWER in llm_srv.PROMPT_TEMPLATE
+
+
+def test_generation_stops_on_quoted_no_info_sentence():
+    llm, _ = _fake_llm(["“I don’t have enough information", " in my current knowledge base to answer that.", "”", " But"])
+    out = "".join(llm_srv.generate_tokens(llm, "prompt", llm_srv.GenerationParams(max_new_tokens=64)))
+    assert out == "“I don’t have enough information in my current knowledge base to answer that."
+
+
+def test_no_decoding_when_window_is_full(monkeypatch):
+    monkeypatch.setattr(llm_srv, "count_tokens", lambda text: llm_srv.LLM_CONTEXT_LENGTH)
+    params = llm_srv.generation_params("Explain LCR", "huge context")
+    assert params.max_new_tokens == 0
+    llm, calls = _fake_llm(["never"])
+    assert list(llm_srv.generate_tokens(llm, "prompt", params)) == []
+    assert calls == {}  # the model was not called
+
+
+def test_token_cap_depends_on_question_and_context(monkeypatch):
+    monkeypatch.setattr(llm_srv, "count_tokens", lambda text: len(text.split()))
+    context = " ".join(["word"] * 1000)
+    short = llm_srv.generation_params("Basel III nedir?", context).max_new_tokens
+    long = llm_srv.generation_params("Explain the difference between LCR and NSFR", context).max_new_tokens
+    tiny = llm_srv.generation_params("Explain LCR", "one line").max_new_tokens
+    assert short < long
+    assert tiny < long
+
+
+def test_cancellation_stops_decoding_between_tokens():
+    cancel = llm_srv.Cancellation()
+
+    def pieces():
+        yield "Basel"
+        cancel.cancel("disconnect")
+        yield " III"
+        yield " never decoded"
+
+    llm, _ = _fake_llm(pieces())
+    out = "".join(llm_srv.generate_tokens(llm, "prompt", llm_srv.GenerationParams(max_new_tokens=10), cancel))
+    assert out == "Basel"
+    assert cancel.reason == "disconnect"
+
+
+def test_cancellation_deadline():
+    cancel = llm_srv.Cancellation(timeout=0.001)
+    cancel.start()
+    llm, _ = _fake_llm(["never"])
+    time.sleep(0.01)
+    assert list(llm_srv.generate_tokens(llm, "prompt", llm_srv.GenerationParams(max_new_tokens=10), cancel)) == []
+    assert cancel.reason == "deadline"
+
+
+def test_cancellation_deadline_starts_on_start():
+    cancel = llm_srv.Cancellation(timeout=0.05)
+    time.sleep(0.06)  # e.g. time spent waiting for a scheduler slot
+    assert cancel.check() is None
+    cancel.start()
+    assert cancel.check() is None
+
+
+@pytest.mark.anyio
+async def test_queued_request_is_not_cancelled_by_queue_time(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, queue_timeout=5, name="test_llm")
+    monkeypatch.setattr(llm_srv, "llm_scheduler", scheduler)
+    llm, _ = _fake_llm(["Basel", " III"])
+    cancel = llm_srv.Cancellation(timeout=0.05)
+
+    async def watch():  # like rag._cancel_on_disconnect, polls while queued
+        while cancel.check() is None:
+            await asyncio.sleep(0.005)
+
+    release = await scheduler.acquire()
+    queued = asyncio.create_task(llm_srv.generate_answer_async(llm, "q", "ctx", cancel))
+    watcher = asyncio.create_task(watch())
+    await asyncio.sleep(0.1)  # slot held longer than the generation deadline
+    release()
+    assert await queued == "Basel III"
+    assert cancel.reason is None
+    watcher.cancel()
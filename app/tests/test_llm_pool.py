@@ -0,0 +1,55 @@
+import queue
+import time
+
+import pytest
+
+from app.services import llm_pool
+from app.services.llm_pool import LLMPool
+
+
+class CrashingProcess:
+    """Worker whose model never loads: exits right away."""
+
+    pid = None
+    exitcode = 1
+
+    def __init__(self, **kwargs):
+        pass
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return False
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class FakeValue:
+    def __init__(self, typecode, value):
+        self.value = value
+
+
+class FakeContext:
+    Queue = queue.Queue
+    Value = FakeValue
+    Process = CrashingProcess
+
+
+def test_replica_that_keeps_crashing_is_given_up(monkeypatch):
+    monkeypatch.setattr(llm_pool.LLMReplica, "POLL_SECONDS", 0.01)
+    pool = LLMPool(1, "model.gguf", 1, max_restarts=2, restart_backoff=0.0, ctx=FakeContext())
+    replica = pool.replicas[0]
+    deadline = time.monotonic() + 5
+    while not replica.failed and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert replica.failed
+    assert replica.restarts == 2
+    with pytest.raises(RuntimeError, match="failed to start"):
+        pool("prompt")
+    pool.close()
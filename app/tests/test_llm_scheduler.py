@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler, SchedulerOverloaded
+
+
+@pytest.mark.anyio
+async def test_scheduler_bounds_concurrency_and_queue():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5, name="test_llm")
+    gate = asyncio.Event()
+    running = []
+
+    async def job(i):
+        async with scheduler.slot():
+            running.append(i)
+            assert scheduler.active == 1
+            await gate.wait()
+
+    first = asyncio.create_task(job(1))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(job(2))
+    await asyncio.sleep(0.01)
+    assert scheduler.waiting == 1
+
+    with pytest.raises(SchedulerOverloaded) as exc:
+        await scheduler.acquire()
+    assert exc.value.retry_after >= 1
+
+    gate.set()
+    await asyncio.gather(first, queued)
+    assert running == [1, 2]
+    assert scheduler.active == 0 and scheduler.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_scheduler_queue_timeout():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, queue_timeout=0.01, name="test_llm")
+    release = await scheduler.acquire()
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.acquire()
+    release()
+    release()  # idempotent
+    async with scheduler.slot():
+        pass
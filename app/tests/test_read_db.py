@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.database import REPLICA_LAG_SQL, ReplicaRouter, async_session_factory, get_read_db, replica_router
+
+
+@pytest.mark.anyio
+async def test_read_db_reuses_primary_session_without_replicas():
+    assert not replica_router.factories
+    primary = object()
+    sessions = get_read_db(primary)
+    assert await sessions.__anext__() is primary
+    await sessions.aclose()
+
+
+def test_lag_probe_requires_streaming_receiver():
+    assert "pg_stat_wal_receiver" in str(REPLICA_LAG_SQL)
+
+
+@pytest.mark.anyio
+async def test_replica_probe_is_shared_and_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPLICA_PROBE_TIMEOUT_SECONDS", 0.05)
+    router = ReplicaRouter(["replica-1:5433"], async_session_factory)
+    calls = []
+
+    async def unreachable(idx):
+        calls.append(idx)
+        await asyncio.sleep(10)  # e.g. connect to a host that drops packets
+
+    monkeypatch.setattr(router, "_measure", unreachable)
+    lags = await asyncio.gather(*[router._probe(0) for _ in range(5)])
+    assert calls == [0]  # one probe, the other requests waited for its result
+    assert lags == [float("inf")] * 5
+    assert router.stats()["replicas"][0]["last_error"].startswith("TimeoutError")
+    assert await router.read_factory() is async_session_factory
+    await router.dispose()
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import rag_service as rag
+from app.services.cache_service import LRUCache, SemanticAnswerCache, retrieval_cache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_respects_byte_limit():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    cache.set("huge", "z" * 11)  # larger than the whole cache -> not stored
+    assert cache.get("huge") is None
+    assert cache.get("b") == "y" * 6
+
+
+@pytest.fixture
+def fake_retrieval(monkeypatch):
+    calls = {"search": 0}
+
+    async def fake_version(db):
+        return 1
+
+    async def fake_embed(text):
+        return np.zeros(4, dtype=np.float32)
+
+    async def fake_search(db, embed, allowed_types, top_k=3, level=None):
+        calls["search"] += 1
+        return [{"chunk_id": f"c-{level}", "document_type": "Regulatory Docs", "level": level}]
+
+    monkeypatch.setattr(rag, "get_corpus_version", fake_version)
+    monkeypatch.setattr(rag, "embed_text_async", fake_embed)
+    monkeypatch.setattr(rag, "vector_search", fake_search)
+    retrieval_cache.clear()
+    yield calls
+    retrieval_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_retrieval_cache_hits_same_level_only(fake_retrieval):
+    _, first = await rag.retrieve_chunks(None, "What is  Basel III?", level=2)
+    _, again = await rag.retrieve_chunks(None, "What is Basel III?", level=2)
+    assert fake_retrieval["search"] == 1
+    assert again == first
+
+    _, other = await rag.retrieve_chunks(None, "What is Basel III?", level=4)
+    assert fake_retrieval["search"] == 2
+    assert other[0]["level"] == 4
+
+
+def test_semantic_cache_matches_paraphrase_within_bucket_only():
+    cache = SemanticAnswerCache(max_entries=8, ttl=60, threshold=0.9)
+    ids = frozenset({"c1", "c2"})
+    cache.store(np.array([1.0, 0.0, 0.0]), 3, ids, 1, "en", "Basel III is ...")
+
+    assert cache.lookup(np.array([0.98, 0.1, 0.0]), 3, ids, 1, "en") == "Basel III is ..."
+    assert cache.lookup(np.array([0.0, 1.0, 0.0]), 3, ids, 1, "en") is None  # not similar enough
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), 4, ids, 1, "en") is None  # other access level
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), 3, frozenset({"c1"}), 1, "en") is None  # other context
+    assert cache.lookup(np.array([1.0, 0.0, 0.0]), 3, ids, 1, "tr") is None  # a translation is answered in its own language
+    assert cache.stats()["hits"] == 1
+
+
+def test_semantic_cache_drops_entries_on_new_corpus_version():
+    cache = SemanticAnswerCache(max_entries=8, ttl=60, threshold=0.9)
+    ids = frozenset({"c1"})
+    cache.store(np.array([1.0, 0.0]), 5, ids, 1, "en", "old")
+    assert cache.lookup(np.array([1.0, 0.0]), 5, ids, 2, "en") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_detect_language():
+    assert rag.detect_language("Basel III nedir?") == "tr"
+    assert rag.detect_language("Kredi kartı aidatı ne kadar?") == "tr"
+    assert rag.detect_language("What is Basel III?") == "en"
+    assert rag.detect_language("Comment BNP Paribas collecte-t-il vos données personnelles?") == "fr"
+
+
+def test_batch_search_casts_query_vectors():
+    stmt = rag.batch_search_statement(np.zeros((2, 1024), dtype=np.float32), ["Public Product Info"], top_k=3)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "(0, CAST(%(q0)s AS vector))" in sql
+    assert "(1, CAST(%(q1)s AS vector))" in sql
+
+
+def test_relevance_threshold_follows_query_language(monkeypatch):
+    monkeypatch.setattr(rag.settings, "RELEVANCE_MAX_DISTANCE", {rag.EMBEDDING_MODEL: {"tr": 0.8, "en": 1.2}})
+    chunks = [{"chunk_id": "c1", "language": "en", "distance": 1.0}]  # English chunk for a Turkish query
+    assert rag.nothing_relevant(chunks, "tr")
+    assert not rag.nothing_relevant(chunks, "en")
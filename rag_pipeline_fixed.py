@@ -382,6 +382,27 @@ Metin:
         return ["etiket1", "etiket2", "etiket3", "etiket4"]
     
     
+CORPUS_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS corpus_version (
+        id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO corpus_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING;
+    CREATE OR REPLACE FUNCTION bump_corpus_version()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE corpus_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS document_chunks_bump_corpus_version ON document_chunks;
+    CREATE TRIGGER document_chunks_bump_corpus_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON document_chunks
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION bump_corpus_version();
+"""
+
 def setup_database(conn) -> None:
     """Set up database schema and extensions."""
     cursor = conn.cursor()
@@ -432,6 +453,12 @@ def setup_database(conn) -> None:
             WITH (lists = 100);
         """)
         
+        # Corpus version counter – every write to document_chunks bumps it so the
+        # API's retrieval cache is invalidated (see sql/004_corpus_version.sql).
+        # The trigger is dropped together with the table above, so recreate it here.
+        logger.info("Installing corpus version trigger...")
+        cursor.execute(CORPUS_VERSION_DDL)
+        
         conn.commit()
         logger.info("Database setup completed successfully.")
         
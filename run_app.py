@@ -2,8 +2,13 @@
 """
 BankBot Application Startup Script
 Run this script from the project root directory.
+
+    python run_app.py                  # all routers
+    python run_app.py --role api-light # /auth + /history only, no ML imports
+    python run_app.py --role rag       # /rag only
 """
 
+import argparse
 import uvicorn
 import os
 import sys
@@ -14,12 +19,21 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the BankBot API")
+    parser.add_argument("--role", choices=["api-light", "rag", "all"], help="routers to mount (default: APP_ROLE)")
+    parser.add_argument("--port", type=int, help="override PORT")
+    args = parser.parse_args()
+    if args.role:
+        # uvicorn (re)imports app.main in its own process; settings read the role from the environment
+        os.environ["APP_ROLE"] = args.role
+
     # Import settings after adding to path
     from app.config import settings
     
     print("🚀 Starting BankBot API...")
+    print(f"Role: {settings.APP_ROLE}")
     print(f"Host: {settings.HOST}")
-    print(f"Port: {settings.PORT}")
+    print(f"Port: {args.port or settings.PORT}")
     print(f"Debug: {settings.DEBUG}")
     print(f"Database: {settings.DB_NAME}")
     print("-" * 50)
@@ -27,7 +41,7 @@ if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
-        port=settings.PORT,
+        port=args.port or settings.PORT,
         reload=settings.DEBUG,
         log_level="info"
-    ) 
\ No newline at end of file
+    )
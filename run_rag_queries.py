@@ -30,10 +30,13 @@ from pathlib import Path
 from typing import List, Tuple, Dict, Any
 
 import psycopg2
+from pgvector.psycopg2 import register_vector  # type: ignore
 from sentence_transformers import SentenceTransformer  # type: ignore
 from ctransformers import AutoModelForCausalLM, AutoConfig  # type: ignore
 import numpy as np
 
+from app.services.access_policy import get_policy
+
 ###############################################################################
 # Configuration                                                               #
 ###############################################################################
@@ -42,15 +45,8 @@ TESTSET_PATH = Path("gorevler/banking_queries_multilingual.md")
 TOP_K = int(os.getenv("TOP_K", "5"))
 DEFAULT_ACCESS_LEVEL = int(os.getenv("ACCESS_LEVEL", "5"))  # 1-5
 
-# Access matrix mapping (Level -> allowed visibility per document type)
-ACCESS_MATRIX: Dict[str, Dict[int, str]] = {
-    "Public Product Info":       {1: "Full", 2: "Full", 3: "Full", 4: "Full", 5: "Full"},
-    "Internal Procedures":       {1: "None", 2: "Full", 3: "Full", 4: "Full", 5: "Full"},
-    "Risk Models":               {1: "None", 2: "None", 3: "Full", 4: "Summary", 5: "Full"},
-    "Regulatory Docs":           {1: "None", 2: "Summary", 3: "Relevant", 4: "Full", 5: "Full"},
-    "Investigation Reports":     {1: "None", 2: "None", 3: "None", 4: "None", 5: "Full"},
-    "Executive Reports":         {1: "None", 2: "None", 3: "None", 4: "Summary", 5: "Full"},
-}
+# Access matrix – same compiled policy the API uses (app/services/access_policy.py)
+POLICY = get_policy()
 
 QUERY_HEADER_RE = re.compile(r"^\*\*[A-Za-zğşıöçĞŞİÖÇ ]+ Query [0-9]+:\*\*")
 EXPECTED_HEADER_RE = re.compile(r"^\*\*Expected Response:\*\*")
@@ -90,31 +86,22 @@ def parse_testset(path: Path) -> List[Tuple[str, str]]:
 
 
 def allowed_document_types(level: int) -> List[str]:
-    """Return doc types with visibility other than 'None' for the level."""
-    allowed: List[str] = []
-    for doc_type, matrix in ACCESS_MATRIX.items():
-        if matrix.get(level, "None") != "None":
-            allowed.append(doc_type)
-    return allowed
+    """Return doc types with visibility other than 'none' for the level."""
+    return POLICY.allowed_types(level)
 
 
 def build_context(chunks: List[Dict[str, Any]], level: int) -> str:
     """Concatenate chunks into a context string with citation tags."""
     parts: List[str] = []
     for idx, ch in enumerate(chunks, 1):
-        vis = ACCESS_MATRIX.get(ch["document_type"], {}).get(level, "None")
-        if vis == "None":
+        content = POLICY.resolve_content(ch, level)
+        if content is None:
             continue
 
         citation = f"{ch['entity']} – {ch['main_section_title']}"
         if ch.get("sub_section_title"):
             citation += f", {ch['sub_section_title']}"
 
-        if vis == "Summary" and ch.get("summary"):
-            content = ch["summary"]
-        else:
-            content = ch.get("text_content") or ch.get("summary") or ""
-
         parts.append(
             f"[[{idx}]] {content}\n*Citation: {citation}*"
         )
@@ -132,25 +119,26 @@ def connect_db():
         "password": os.getenv("DB_PASSWORD"),
         "port": os.getenv("DB_PORT", "5432"),
     }
-    return psycopg2.connect(**params)
+    conn = psycopg2.connect(**params)
+    register_vector(conn)  # adapt NumPy arrays to the vector type directly
+    return conn
 
 
 def vector_search(conn, embed: np.ndarray, allowed_doc_types: List[str], top_k: int) -> List[Dict[str, Any]]:
     """Return top-k document chunks as list of dicts."""
     cur = conn.cursor()
-    # Convert numpy embedding to pgvector literal string: '[0.1,0.2,...]'
-    vec_literal = '[' + ','.join(f'{x:.6f}' for x in embed.tolist()) + ']'
+    vec = np.asarray(embed, dtype=np.float32)
 
     placeholders = ','.join(['%s'] * len(allowed_doc_types)) if allowed_doc_types else "''"
     sql = (
         f"SELECT chunk_id, source_document, entity, language, document_type, "
-        f"main_section_title, sub_section_title, text_content, summary, "
+        f"main_section_title, sub_section_title, text_content, summary, generated_labels, "
         f"embedding <-> %s::vector AS distance "
         f"FROM document_chunks "
         f"WHERE document_type IN ({placeholders}) "
         f"ORDER BY embedding <-> %s::vector LIMIT %s;"
     )
-    params = [vec_literal] + allowed_doc_types + [vec_literal, top_k]
+    params = [vec] + allowed_doc_types + [vec, top_k]
     cur.execute(sql, params)
     rows = cur.fetchall()
     cur.close()
@@ -164,6 +152,7 @@ def vector_search(conn, embed: np.ndarray, allowed_doc_types: List[str], top_k:
         "sub_section_title",
         "text_content",
         "summary",
+        "generated_labels",
         "distance",
     ]
     return [dict(zip(cols, row)) for row in rows]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Prompt-Prefix Cache Benchmark
+-----------------------------
+Measures prefill time per request with and without KV reuse of the static
+BankBot instruction block (``LLM_RUNTIME=llama_cpp``).
+
+For each sample prompt the time to the first generated token is measured
+twice on the same model instance:
+
+* ``cold`` – KV cache reset, the whole prompt is evaluated;
+* ``warm`` – KV cache holds the instruction block, and llama.cpp's built-in
+  prefix matching evaluates only context + question.
+
+Requires ``llama-cpp-python`` and the GGUF model (``YI_MODEL_PATH``).
+
+Run:  python scripts/bench_prefix_cache.py [--rounds 5] [--threads 8]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+from pathlib import Path
+
+# Ensure project root on path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.llama_cpp_runtime import LlamaCppModel
+from app.services.llm_service import PROMPT_PREFIX, build_prompt
+
+SAMPLES = [
+    (
+        "What is the minimum liquidity coverage ratio?",
+        "[[1]] Banks shall maintain a liquidity coverage ratio of at least 100%.\n*Citation: BDDK – Liquidity Regulation*",
+    ),
+    (
+        "Kredi kartı aidatı ne kadar?",
+        "[[1]] Bireysel kredi kartı yıllık aidatı 350 TL'dir.\n*Citation: Ürün Bilgileri – Kredi Kartları*",
+    ),
+    (
+        "How are operational risk losses reported?",
+        "[[1]] Operational risk losses above the threshold are reported monthly to the risk committee.\n"
+        "*Citation: Risk Models – Operational Risk*\n\n"
+        "[[2]] Reports include root cause and recovery amount.\n*Citation: Internal Audit – Reporting*",
+    ),
+]
+
+
+def main(rounds: int, threads: int) -> None:
+    model_path = os.getenv("YI_MODEL_PATH", "./models/yi-1.5-9b-chat/Yi-1.5-9B-Chat-Q4_K_M.gguf")
+    model = LlamaCppModel(model_path, threads, prefix=PROMPT_PREFIX)
+    print(f"prefix tokens: {len(model.prefix_tokens)}")
+
+    cold, warm = [], []
+    for _ in range(rounds):
+        for query, context in SAMPLES:
+            prompt = build_prompt(query, context)
+            cold.append(model.prefill_seconds(prompt, use_prefix=False))
+            warm.append(model.prefill_seconds(prompt, use_prefix=True))
+
+    for name, samples in (("cold", cold), ("warm", warm)):
+        ms = [s * 1000 for s in samples]
+        print(f"{name}  mean={statistics.mean(ms):8.1f} ms  p50={statistics.median(ms):8.1f} ms")
+    print(f"prefill saved per request: {(statistics.mean(cold) - statistics.mean(warm)) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    main(args.rounds, args.threads)
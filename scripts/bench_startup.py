@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+-----------------
+Imports ``app.main`` for each role in a fresh interpreter with
+``python -X importtime`` and reports:
+
+* wall time of the import (interpreter start excluded),
+* cumulative import time of ``app.main`` from the ``-X importtime`` log,
+* peak RSS of the child process,
+* whether torch / sentence_transformers / ctransformers got imported,
+* the slowest top-level imports.
+
+Run:  python scripts/bench_startup.py [--roles api-light rag all] [--top 8]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+HEAVY = ("torch", "sentence_transformers", "ctransformers", "transformers")
+
+PROBE = """
+import resource, sys, time
+t0 = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - t0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(f"RESULT {{elapsed:.3f}} {{rss_kb}} {{','.join(heavy) or '-'}}")
+"""
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(role: str, top: int) -> None:
+    env = dict(os.environ, APP_ROLE=role, PYTHONPATH=str(ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(heavy=HEAVY)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    result = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT")), None)
+    if proc.returncode != 0 or result is None:
+        print(f"{role:<10} failed:\n{proc.stderr[-2000:]}")
+        return
+    _, elapsed, rss_kb, heavy = result.split()
+
+    # -X importtime lists children before their parent; keep the direct children of app.main
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            entries.append((len(match.group(3)) // 2, int(match.group(2)), match.group(4)))
+    main_at = next(i for i, e in enumerate(entries) if e[2] == "app.main")
+    depth, total_us, _ = entries[main_at]
+    top_level = []
+    for entry_depth, us, name in reversed(entries[:main_at]):
+        if entry_depth <= depth:
+            break
+        if entry_depth == depth + 1:
+            top_level.append((us, name))
+
+    print(f"{role:<10} import={float(elapsed):.3f}s  cumulative={total_us / 1e6:.3f}s  "
+          f"peak_rss={int(rss_kb) / 1024:.0f} MB  heavy={heavy}")
+    for us, name in sorted(top_level, reverse=True)[:top]:
+        print(f"{'':<10}   {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roles", nargs="+", default=["api-light", "rag", "all"])
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports of app.main to list")
+    args = parser.parse_args()
+    for role in args.roles:
+        measure(role, args.top)
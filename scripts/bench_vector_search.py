@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Vector Search Micro-Benchmark
+-----------------------------
+Compares per-query overhead of the two phase-one search paths against the
+same database and query vector:
+
+* ``orm``  – SQLAlchemy select, vector sent as ``embed.tolist()`` (text)
+* ``fast`` – raw asyncpg, cached prepared statement, binary pgvector codec
+
+Both run the identical ANN query, so the latency difference is client-side
+overhead (statement building, vector encoding, row decoding). A random unit
+vector is used by default so the embedding model is not needed.
+
+Run:  python scripts/bench_vector_search.py [--iterations 500] [--level 5] [--embed "query text"]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root on path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.database import async_session_factory, engine
+from app.services import rag_service as rag
+from app.services.fast_search import close_pool, fast_vector_search
+
+
+def _report(name: str, samples: list) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<6} mean={statistics.mean(ms):7.3f} ms  p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms")
+
+
+async def run(iterations: int, level: int, query: str) -> None:
+    if query:
+        embed = rag.embed_text(query).astype(np.float32)
+    else:
+        embed = np.random.default_rng(0).standard_normal(settings.VECTOR_DIMENSION).astype(np.float32)
+        embed /= np.linalg.norm(embed)
+    allowed = rag.allowed_doc_types(level)
+    top_k = rag.TOP_K_DEFAULT
+
+    # Client-side vector encoding alone
+    from pgvector import Vector  # type: ignore
+
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        "[" + ",".join(str(x) for x in embed.tolist()) + "]"
+    text_enc = (time.perf_counter() - t0) / iterations
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        Vector._to_db_binary(embed)
+    bin_enc = (time.perf_counter() - t0) / iterations
+    print(f"vector encoding: text={text_enc * 1e6:.1f} µs  binary={bin_enc * 1e6:.1f} µs")
+
+    orm, fast = [], []
+    async with async_session_factory() as session:
+        # warm-up: connection setup, statement preparation, codec registration
+        await rag.orm_vector_search(session, embed, allowed, top_k)
+        await fast_vector_search(embed, allowed, top_k)
+
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            await rag.orm_vector_search(session, embed, allowed, top_k)
+            orm.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            await fast_vector_search(embed, allowed, top_k)
+            fast.append(time.perf_counter() - t0)
+
+    print(f"{iterations} iterations, level={level}, top_k={top_k}")
+    _report("orm", orm)
+    _report("fast", fast)
+    print(f"saved per query: {(statistics.mean(orm) - statistics.mean(fast)) * 1000:.3f} ms")
+
+    await close_pool()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--level", type=int, default=5)
+    parser.add_argument("--embed", default="", help="embed this query text instead of using a random vector")
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations, args.level, args.embed))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Relevance Threshold Calibration
+-------------------------------
+Suggests ``RELEVANCE_MAX_DISTANCE`` values for the current embedding model.
+
+Input is a JSONL file of labelled questions::
+
+    {"query": "Kredi kartı aidatı ne kadar?", "answerable": true}
+    {"query": "Who won the 1998 World Cup?", "answerable": false}
+
+Each query is embedded and searched over all document types. The nearest
+chunk's distance is recorded under the query's language (``"language"`` in
+the row, else detected like at answer time). Per language the suggested
+threshold is the smallest distance that still keeps ``--recall`` of the
+answerable questions; the script reports how many unanswerable questions that
+threshold would short-circuit.
+
+Run:  python scripts/calibrate_relevance.py questions.jsonl [--recall 0.98]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Ensure project root on path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session_factory, engine
+from app.services import rag_service as rag
+
+
+async def run(path: Path, recall: float) -> None:
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    all_types = list(rag.get_policy().matrix)
+    samples = defaultdict(lambda: {"answerable": [], "unanswerable": []})
+
+    async with async_session_factory() as session:
+        for row in rows:
+            embed = await rag.embed_text_async(row["query"])
+            chunks = await rag.orm_vector_search(session, embed, all_types, 1)
+            if not chunks:
+                continue
+            best = chunks[0]
+            key = "answerable" if row.get("answerable", True) else "unanswerable"
+            language = row.get("language") or rag.detect_language(row["query"])
+            samples[language][key].append(best["distance"])
+    await engine.dispose()
+
+    suggestion = {}
+    for language, groups in sorted(samples.items()):
+        good = sorted(groups["answerable"])
+        bad = groups["unanswerable"]
+        if not good:
+            print(f"{language}: no answerable samples, skipped")
+            continue
+        threshold = round(good[max(0, math.ceil(len(good) * recall) - 1)] + 1e-3, 3)
+        caught = sum(d > threshold for d in bad)
+        suggestion[language] = threshold
+        print(
+            f"{language}: answerable={len(good)} unanswerable={len(bad)} "
+            f"threshold={threshold} short-circuits {caught}/{len(bad)} unanswerable"
+        )
+    print("\nRELEVANCE_MAX_DISTANCE=" + json.dumps({rag.EMBEDDING_MODEL: suggestion}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", type=Path)
+    parser.add_argument("--recall", type=float, default=0.98, help="share of answerable questions to keep")
+    args = parser.parse_args()
+    asyncio.run(run(args.questions, args.recall))
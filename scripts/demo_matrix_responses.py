@@ -1,3 +1,5 @@
+import time
+
 import requests
 
 API = "http://localhost:8000"
@@ -19,14 +21,23 @@ def login(u, p):
 
 def answer(tok):
     h = {"Authorization": f"Bearer {tok}"}
-    r = requests.post(f"{API}/rag/answer",
+    r = requests.post(f"{API}/rag/answer/jobs",
                       json={"query": QUERY},
                       headers=h,
-                      timeout=300)
+                      timeout=20)
     if r.status_code == 404:
         return f"[404] {r.json()['detail']}"
     r.raise_for_status()
-    return r.json()["answer"]
+    job = r.json()
+    # Poll instead of holding one connection open for the whole generation
+    while job["status"] in ("queued", "running"):
+        time.sleep(2)
+        r = requests.get(f"{API}/rag/answer/jobs/{job['job_id']}", headers=h, timeout=20)
+        r.raise_for_status()
+        job = r.json()
+    if job["status"] == "failed":
+        return f"[failed] {job['error']}"
+    return job["answer"]
 
 if __name__ == "__main__":
     for u, p in USERS:
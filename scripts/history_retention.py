@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Query History Retention
+-----------------------
+Partition maintenance for the monthly ``query_history`` partitions
+(``sql/005_query_history_partitioning.sql``). Must run daily from cron:
+
+* creates partitions for the next ``HISTORY_PARTITION_MONTHS_AHEAD`` months,
+  moving rows that already landed in ``query_history_default`` into them;
+* partitions older than ``HISTORY_RETENTION_MONTHS`` are detached (default –
+  they stay as plain ``query_history_yYYYYmMM`` tables to archive with
+  ``pg_dump -t`` and drop afterwards) or dropped with ``--mode drop``.
+
+Run:  python scripts/history_retention.py [--keep-months 24] [--mode detach|drop] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Ensure project root on path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.database import engine
+from app.services import history_partitions
+
+
+async def run(keep_months: int, mode: str, dry_run: bool) -> None:
+    async with engine.begin() as conn:
+        if not dry_run:
+            await history_partitions.ensure_partitions(conn, settings.HISTORY_PARTITION_MONTHS_AHEAD)
+        expired = await history_partitions.expire_partitions(conn, keep_months, mode=mode, dry_run=dry_run)
+        stray = await history_partitions.default_partition_rows(conn)
+    await engine.dispose()
+
+    if stray:
+        print(f"WARNING: {stray} rows in {history_partitions.DEFAULT_PARTITION} outside the managed months")
+
+    action = "would " + mode if dry_run else mode + "ed"
+    if not expired:
+        print(f"No partitions older than {keep_months} months")
+    for name in expired:
+        print(f"{action}: {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep-months", type=int, default=settings.HISTORY_RETENTION_MONTHS)
+    parser.add_argument("--mode", choices=("detach", "drop"), default="detach")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.keep_months, args.mode, args.dry_run))
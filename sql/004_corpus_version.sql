@@ -0,0 +1,30 @@
+-- Corpus version counter for retrieval result caching
+-- The API caches top-k results per (query, access level, top_k, corpus version).
+-- Any write to document_chunks bumps the version so cached results are never
+-- served for a corpus that has changed.
+
+CREATE TABLE IF NOT EXISTS corpus_version (
+    id         INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version    BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_version (id, version) VALUES (1, 1)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_corpus_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE corpus_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level: one bump per INSERT/UPDATE/DELETE statement, not per row
+DROP TRIGGER IF EXISTS document_chunks_bump_corpus_version ON document_chunks;
+CREATE TRIGGER document_chunks_bump_corpus_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON document_chunks
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_corpus_version();
+
+COMMENT ON TABLE corpus_version IS 'Single-row counter bumped on every document_chunks write; used to invalidate API retrieval caches';
@@ -0,0 +1,99 @@
+-- Monthly range partitioning of query_history
+-- Every history query filters by user_id and orders by created_at, and the
+-- table only grows. This migration:
+--   * turns query_history into a table partitioned by RANGE (created_at),
+--     one partition per month (query_history_yYYYYmMM);
+--   * replaces the single-column indexes with (user_id, session_id, created_at)
+--     and (user_id, created_at) composite indexes;
+--   * copies existing rows into the new partitions.
+-- The primary key becomes (id, created_at) because a partitioned table's
+-- unique constraints must include the partition key.
+-- scripts/history_retention.py MUST run daily (cron): it creates upcoming
+-- partitions (HISTORY_PARTITION_MONTHS_AHEAD) and detaches or drops old ones.
+-- The API also creates upcoming partitions at startup. A DEFAULT partition
+-- catches rows for months nobody created, so inserts never fail.
+-- Runs in one transaction; on a large table schedule it in a maintenance window.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION create_query_history_partition(month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    first_day DATE := date_trunc('month', month_start)::DATE;
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF query_history FOR VALUES FROM (%L) TO (%L)',
+        'query_history_y' || to_char(first_day, 'YYYY') || 'm' || to_char(first_day, 'MM'),
+        first_day,
+        (first_day + INTERVAL '1 month')::DATE
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    is_partitioned BOOLEAN;
+    first_month DATE;
+    cur_month DATE;
+BEGIN
+    SELECT EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('query_history')
+    ) INTO is_partitioned;
+    IF is_partitioned THEN
+        RAISE NOTICE 'query_history is already partitioned';
+        RETURN;
+    END IF;
+
+    IF to_regclass('query_history') IS NOT NULL THEN
+        ALTER TABLE query_history RENAME TO query_history_legacy;
+        ALTER INDEX IF EXISTS query_history_pkey RENAME TO query_history_legacy_pkey;
+    END IF;
+
+    CREATE TABLE query_history (
+        id            UUID NOT NULL,
+        user_id       UUID NOT NULL REFERENCES users(id),
+        session_id    UUID NOT NULL,
+        route         VARCHAR(20) NOT NULL,
+        query_text    TEXT NOT NULL,
+        response_text TEXT,
+        ip_address    VARCHAR(45),
+        created_at    TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    -- Declared on the parent, created on every partition
+    CREATE INDEX ix_query_history_user_session_created
+        ON query_history (user_id, session_id, created_at DESC, id DESC);
+    CREATE INDEX ix_query_history_user_created
+        ON query_history (user_id, created_at DESC, id DESC);
+
+    first_month := date_trunc('month', CURRENT_DATE)::DATE;
+    IF to_regclass('query_history_legacy') IS NOT NULL THEN
+        SELECT LEAST(first_month, date_trunc('month', MIN(created_at))::DATE)
+          INTO first_month
+          FROM query_history_legacy;
+    END IF;
+
+    cur_month := first_month;
+    WHILE cur_month <= (date_trunc('month', CURRENT_DATE) + INTERVAL '3 months')::DATE LOOP
+        PERFORM create_query_history_partition(cur_month);
+        cur_month := (cur_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    -- Safety net: rows for a month without a partition land here instead of failing;
+    -- ensure_partitions moves them into their month partition once it is created
+    CREATE TABLE query_history_default PARTITION OF query_history DEFAULT;
+
+    IF to_regclass('query_history_legacy') IS NOT NULL THEN
+        INSERT INTO query_history (id, user_id, session_id, route, query_text, response_text, ip_address, created_at)
+        SELECT id, user_id, session_id, route, query_text, response_text, ip_address,
+               COALESCE(created_at, CURRENT_TIMESTAMP)
+          FROM query_history_legacy;
+        DROP TABLE query_history_legacy;
+    END IF;
+END;
+$$;
+
+COMMENT ON TABLE query_history IS 'Per-request RAG history, range-partitioned by month on created_at (query_history_yYYYYmMM)';
+
+COMMIT;
@@ -0,0 +1,21 @@
+-- Compact query_history responses
+-- New rows store response_payload instead of response_text:
+--   retrieve: {"v": 1, "chunks": [{"id", "access", "distance", "hash"}]} – chunk
+--             references plus the access type and a hash of the returned content;
+--   answer:   {"v": 1, "answer": "..."}
+-- The API rebuilds the original response_text on read. Legacy rows keep
+-- response_text and are returned unchanged.
+-- lz4 compression of the TOASTed payload needs PostgreSQL 14+ built with lz4;
+-- partitions created later inherit the column setting.
+
+ALTER TABLE query_history ADD COLUMN IF NOT EXISTS response_payload JSONB;
+ALTER TABLE query_history ALTER COLUMN response_payload SET COMPRESSION lz4;
+
+COMMENT ON COLUMN query_history.response_payload IS 'Compact response (chunk refs + content hashes + access type, or answer text); rebuilt into response_text on read';
+COMMENT ON COLUMN query_history.response_text IS 'Full response as returned (rows written before response_payload)';
+
+-- Optional backfill for answer rows; run per partition in a maintenance window:
+-- UPDATE query_history_y2025m01
+--    SET response_payload = jsonb_build_object('v', 1, 'answer', (response_text::jsonb) -> 0 ->> 'answer'),
+--        response_text = NULL
+--  WHERE route = 'answer' AND response_payload IS NULL AND response_text LIKE '[%';